@@ -0,0 +1,142 @@
+"""Deterministic synthetic ir.list files.
+
+Points are drawn around a few hotspots, their value falls off with the
+distance to the nearest one. The same arguments always write the same
+file, so results of different releases stay comparable.
+
+    python benchmarks/generate.py OUT [--points N] [--nets NAMES]
+        [--clusters K] [--spread S] [--depth D] [--seed SEED]
+"""
+
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+NETS = ("VCC", "VSS", "VCCA", "VSSA", "VCCD", "VSSD")
+# side of the square die
+DIE = 1000.0
+# children of every hierarchy level
+FANOUT = 50
+# lines formatted and written at a time
+CHUNK = 1 << 20
+
+
+def parse_count(text: str) -> int:
+    """`10k` -> 10000, `100M` -> 100000000"""
+    scale = {"k": 10**3, "m": 10**6, "g": 10**9}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def generate(
+    out: Path,
+    points: int,
+    nets: Sequence[str] = NETS,
+    clusters: int = 8,
+    spread: float = 0.05,
+    depth: int = 4,
+    seed: int = 0,
+) -> Path:
+    """Write `points` lines to `out`.
+
+    A quarter of the points is spread uniformly over the die, the rest is
+    normally distributed around `clusters` hotspots with a standard deviation
+    of `spread` times the die size. Paths have 1 to `depth` levels.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0.1 * DIE, 0.9 * DIE, size=(max(clusters, 1), 2))
+    names = np.array(nets)
+    with open(out, "w") as f:
+        f.write("#net  value  x      y      path\n")
+        for start in range(0, points, CHUNK):
+            count = min(CHUNK, points - start)
+            xy = rng.uniform(0.0, DIE, size=(count, 2))
+            hot = rng.random(count) >= 0.25
+            if clusters > 0:
+                center = centers[rng.integers(0, clusters, size=count)]
+                near = rng.normal(center, spread * DIE)
+                xy[hot] = np.clip(near[hot], 0.0, DIE)
+            nearest = np.min(
+                np.hypot(
+                    xy[:, None, 0] - centers[:, 0], xy[:, None, 1] - centers[:, 1]
+                ),
+                axis=1,
+            )
+            value = 40.0 * np.exp(-((nearest / (spread * DIE * 2)) ** 2))
+            value += rng.uniform(0.0, 10.0, size=count)
+            net = names[rng.integers(0, len(names), size=count)]
+            levels = rng.integers(1, depth + 1, size=count)
+            segments = rng.integers(0, FANOUT, size=(count, depth))
+            lines = [
+                f"{n}  {v:.2f}  {x:.2f}  {y:.2f}  "
+                + "/".join(f"X{s}" for s in seg[:level])
+                for n, v, x, y, seg, level in zip(
+                    net.tolist(),
+                    value.tolist(),
+                    xy[:, 0].tolist(),
+                    xy[:, 1].tolist(),
+                    segments.tolist(),
+                    levels.tolist(),
+                )
+            ]
+            f.write("\n".join(lines))
+            f.write("\n")
+    return out
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out", type=Path, help="file to write")
+    parser.add_argument(
+        "--points",
+        type=parse_count,
+        help="number of lines, may end with k or M, default=100k",
+        default=100_000,
+    )
+    parser.add_argument(
+        "--nets",
+        type=str,
+        help=f"comma separated net names, default={','.join(NETS)!r}",
+        default=",".join(NETS),
+    )
+    parser.add_argument(
+        "--clusters",
+        type=int,
+        help="number of hotspots, 0 spreads every point uniformly, default=8",
+        default=8,
+    )
+    parser.add_argument(
+        "--spread",
+        type=float,
+        help="hotspot size as a fraction of the die, default=0.05",
+        default=0.05,
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        help="max number of path levels, default=4",
+        default=4,
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="random seed, default=0",
+        default=0,
+    )
+    args = parser.parse_args()
+    generate(
+        args.out,
+        args.points,
+        nets=[net for net in args.nets.split(",") if net],
+        clusters=args.clusters,
+        spread=args.spread,
+        depth=args.depth,
+        seed=args.seed,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
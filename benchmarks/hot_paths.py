@@ -0,0 +1,168 @@
+"""Time and peak memory of the load, tiling and render hot paths.
+
+Synthetic files are made by `generate.py` and kept in the data directory,
+so later runs only parse them. Every step is run a few times, the best
+wall time and its peak traced memory are written to a JSON report.
+
+    python benchmarks/hot_paths.py [--sizes 10k,100k,1M] [--grids 10x10,50x50]
+        [--repeat N] [--data DIR] [--out FILE]
+"""
+
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import matplotlib
+import numpy as np
+from generate import generate, parse_count
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import irhm
+from irhm.ir import ArrayInfo, Tiles, from_file
+from irhm.render import draw_heatmap
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Best wall time of `func`, and its peak memory traced in one more run
+    since tracing slows down allocations."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": min(seconds), "peak_bytes": peak}
+
+
+def render_png(drop: np.ndarray) -> bytes:
+    figure = Figure(facecolor="#DFDFDF")
+    FigureCanvasAgg(figure)
+    draw_heatmap(figure, drop, "benchmark")
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def array_info(tiles: Tiles, net1: str, net2: str) -> ArrayInfo:
+    # measure the reduction, not the memoized result
+    tiles.drop.cache_clear()
+    return tiles.array_info(net1, net2)
+
+
+def bench_size(
+    file: Path, grids: List[tuple], repeat: int, log: Callable[[dict], None]
+) -> None:
+    collection = from_file(file, cache=False)
+
+    def record(step: str, result: Dict[str, float], grid=None) -> None:
+        log(dict(points=collection.size, step=step, grid=grid, **result))
+
+    record("from_file", measure(lambda: from_file(file, cache=False), repeat))
+    net1, net2 = collection.nets[:2]
+    record("get_box", measure(collection.get_box, repeat))
+    (x_min, y_min), (x_max, y_max) = collection.get_box()
+    for cols, rows in grids:
+        grid = f"{cols}x{rows}"
+        record(
+            "make_tiles",
+            measure(partial(collection.make_tiles, cols, rows), repeat),
+            grid,
+        )
+        width, height = (x_max - x_min) / cols, (y_max - y_min) / rows
+        record(
+            "make_tiles_by_size",
+            measure(partial(collection.make_tiles_by_size, width, height), repeat),
+            grid,
+        )
+        tiles = collection.make_tiles(cols, rows)
+        record(
+            "array_info", measure(partial(array_info, tiles, net1, net2), repeat), grid
+        )
+        drop = np.array(tiles.drop(net1, net2))
+        record("render", measure(partial(render_png, drop), repeat), grid)
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        help="comma separated numbers of points, may end with k or M, "
+        "default='10k,100k,1M'",
+        default="10k,100k,1M",
+    )
+    parser.add_argument(
+        "--grids",
+        type=str,
+        help="comma separated tile arrays, default='10x10,50x50,200x200'",
+        default="10x10,50x50,200x200",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="runs per step, the best is kept, default=3",
+        default=3,
+    )
+    parser.add_argument(
+        "--data",
+        type=Path,
+        help="directory of the generated files, default=benchmarks/data",
+        default=ROOT / "benchmarks" / "data",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        help="JSON report to write, default=benchmarks/results.json",
+        default=ROOT / "benchmarks" / "results.json",
+    )
+    args = parser.parse_args()
+    grids = [tuple(map(int, grid.split("x"))) for grid in args.grids.split(",")]
+
+    args.data.mkdir(parents=True, exist_ok=True)
+    results = []
+
+    def log(result: dict) -> None:
+        results.append(result)
+        print(
+            f"{result['points']:>12,} {result['step']:<20}{result['grid'] or '':>9}"
+            f"{result['seconds']:10.3f}s{result['peak_bytes'] / 2**20:10.1f} MiB"
+        )
+
+    for size in args.sizes.split(","):
+        file = args.data / f"synthetic_{size}.list"
+        if not file.exists():
+            print(f"generating {file}")
+            generate(file, parse_count(size))
+        bench_size(file, grids, args.repeat, log)
+
+    report = {
+        "irhm": irhm.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"written {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Startup time of the command line.
+
+Runs each command a few times in a fresh interpreter and reports the best
+wall time. Exits with 1 when a command is slower than the budget, or when
+importing the entry point loads the GUI stack.
+
+    python benchmarks/import_time.py [--budget SECONDS] [--repeat N]
+"""
+
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS = {
+    "import irhm._main": ["-c", "import irhm._main"],
+    "irhm --help": ["-m", "irhm", "--help"],
+    "irhm render --help": ["-m", "irhm", "render", "--help"],
+    "irhm diff --help": ["-m", "irhm", "diff", "--help"],
+}
+
+# modules that must not be loaded before a window is opened
+HEAVY = ("PyQt5", "PySide6", "matplotlib", "seaborn", "pandas")
+
+CHECK = f"""
+import sys
+import irhm._main
+loaded = sorted({{m.split(".")[0] for m in sys.modules}} & set({HEAVY!r}))
+print(",".join(loaded))
+"""
+
+
+def run(args, env) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, *args],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="max seconds per command, default=0.5",
+        default=0.5,
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="runs per command, the best is kept, default=5",
+        default=5,
+    )
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(ROOT), env.get("PYTHONPATH")])
+    )
+    failed = False
+
+    baseline = min(run(["-c", "pass"], env) for _ in range(args.repeat))
+    print(f"{'python -c pass':<24}{baseline:8.3f}s")
+    for name, command in COMMANDS.items():
+        best = min(run(command, env) for _ in range(args.repeat))
+        over = best > args.budget
+        failed |= over
+        print(f"{name:<24}{best:8.3f}s{'  over budget' if over else ''}")
+
+    loaded = subprocess.run(
+        [sys.executable, "-c", CHECK],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    if loaded:
+        print(f"import irhm._main loads {loaded}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
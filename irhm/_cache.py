@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+from typing import IO, Dict, Optional, Tuple, Union, final
+
+import numpy as np
+
+MAGIC = b"IRHMCACH"
+VERSION = 2
+SUFFIX = ".irhm"
+
+_ALIGN = 64
+_SAMPLE = 1 << 20
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def sidecar(file: Union[str, Path]) -> Path:
+    """Cache file kept next to `file`."""
+    file = Path(file)
+    return file.with_name(file.name + SUFFIX)
+
+
+def fingerprint(file: Union[str, Path]) -> dict:
+    """Size, mtime and a content hash of `file`.
+
+    Only the first and last MiB are hashed so that checking the cache of a
+    multi-GB report stays cheap, size and mtime catch everything else.
+    """
+    stat = os.stat(file)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, "rb") as f:
+        digest.update(f.read(_SAMPLE))
+        if stat.st_size > 2 * _SAMPLE:
+            f.seek(-_SAMPLE, os.SEEK_END)
+        digest.update(f.read(_SAMPLE))
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": digest.hexdigest(),
+    }
+
+
+def save(
+    file: Union[str, Path],
+    meta: dict,
+    arrays: Dict[str, np.ndarray],
+    key: dict,
+) -> bool:
+    """Write `arrays` and `meta` to the sidecar of `file`.
+
+    The file is a fixed preamble, a JSON header and then every array as raw
+    bytes aligned to 64 bytes, so `load` can memory-map them in place.
+
+    `key` is the `fingerprint` of `file` taken before it was parsed. Nothing
+    is written if the file has changed since, e.g. lines were appended while
+    it was read, as the arrays would be stale under a fresh key. Returns
+    False if the sidecar was not written.
+    """
+    dtypes = {name: array.dtype.str for name, array in arrays.items()}
+    with Writer(file, dtypes, key) as writer:
+        for name, array in arrays.items():
+            writer.put(name, array)
+        return writer.commit(meta)
+
+
+@final
+class Writer:
+    """Stream arrays into the sidecar of `file` without holding them.
+
+    Every named array is appended piecewise to its own temporary column file,
+    or handed over whole with `put`. `commit` then copies them one after
+    another into a sidecar in the layout `save` describes. `key` is the
+    `fingerprint` of `file`, taken when the writer is made if not given, in
+    any case before anything is parsed.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, Path],
+        dtypes: Dict[str, str],
+        key: Optional[dict] = None,
+    ) -> None:
+        self.file = file
+        self.key = fingerprint(file) if key is None else key
+        self.path = sidecar(file)
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in dtypes.items()}
+        self.counts = dict.fromkeys(dtypes, 0)
+        # column files are made by the first `append` to them and stay open
+        # until `close`, `put` arrays are written straight from memory
+        self.columns: Dict[str, IO[bytes]] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.__files = ExitStack()
+
+    def __enter__(self) -> "Writer":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__files.close()
+
+    def append(self, name: str, array: np.ndarray) -> None:
+        if name not in self.columns:
+            with ExitStack() as stack:
+                self.columns[name] = stack.enter_context(
+                    tempfile.TemporaryFile(dir=self.path.parent)
+                )
+                self.__files.enter_context(stack.pop_all())
+        np.ascontiguousarray(array, dtype=self.dtypes[name]).tofile(self.columns[name])
+        self.counts[name] += len(array)
+
+    def put(self, name: str, array: np.ndarray) -> None:
+        """Make `array` all of column `name`."""
+        self.arrays[name] = np.ascontiguousarray(array, dtype=self.dtypes[name])
+        self.counts[name] = len(array)
+
+    def commit(self, meta: dict) -> bool:
+        """Write the sidecar, returns False if it could not be written or
+        `file` changed since the writer was made."""
+        if not unchanged(self.file, self.key):
+            return False
+        header = {
+            "key": self.key,
+            "meta": meta,
+            "arrays": {},
+        }
+        offset = 0
+        for name, dtype in self.dtypes.items():
+            header["arrays"][name] = [dtype.str, offset, self.counts[name]]
+            offset += _aligned(self.counts[name] * dtype.itemsize)
+        text = json.dumps(header).encode()
+        try:
+            fd, temp = tempfile.mkstemp(prefix=self.path.name, dir=self.path.parent)
+        except OSError:
+            return False
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_PREAMBLE.pack(MAGIC, VERSION, len(text)))
+                f.write(text)
+                for name in self.dtypes:
+                    f.write(b"\0" * (_aligned(f.tell()) - f.tell()))
+                    if name in self.arrays:
+                        self.arrays[name].tofile(f)
+                    elif name in self.columns:
+                        column = self.columns[name]
+                        column.seek(0)
+                        while data := column.read(_SAMPLE):
+                            f.write(data)
+            os.chmod(temp, 0o644)
+            os.replace(temp, self.path)
+        except OSError:
+            os.unlink(temp)
+            return False
+        return True
+
+
+def load(file: Union[str, Path]) -> Optional[Tuple[dict, Dict[str, np.ndarray]]]:
+    """Memory-map the sidecar of `file`, None if it is missing or stale."""
+    path = sidecar(file)
+    try:
+        with open(path, "rb") as f:
+            magic, version, length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC or version != VERSION:
+                return None
+            header = json.loads(f.read(length))
+        if header["key"] != fingerprint(file):
+            return None
+    except (OSError, ValueError, struct.error):
+        return None
+    start = _aligned(_PREAMBLE.size + length)
+    arrays = {}
+    try:
+        for name, (dtype, offset, count) in header["arrays"].items():
+            if count == 0:
+                arrays[name] = np.zeros(0, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(
+                    path, dtype=dtype, mode="r", offset=start + offset, shape=(count,)
+                ).view(np.ndarray)
+    except (OSError, ValueError, TypeError):
+        # truncated or corrupt sidecar, parse the file again
+        return None
+    return header["meta"], arrays
+
+
+def unchanged(file: Union[str, Path], key: dict) -> bool:
+    """Whether `file` still has the `fingerprint` `key`."""
+    try:
+        return fingerprint(file) == key
+    except OSError:
+        return False
+
+
+def _aligned(size: int) -> int:
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
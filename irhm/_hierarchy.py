@@ -0,0 +1,311 @@
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+SEPARATOR = "/"
+# items reduced at a time, like `ir.STREAM_ROWS`
+REDUCE_ROWS = 1 << 22
+# slices hashed or compared at a time by `intern_slices`
+HASH_ROWS = 1 << 16
+
+
+class Hierarchy:
+    """Instance paths interned into a tree of integer node ids.
+
+    Every distinct path prefix is one node, named by its last segment, so a
+    prefix shared by many paths is stored once. Nodes are numbered depth by
+    depth, `parent` and `depth` are per node and `leaf[path id]` is the node
+    of a whole path. `leaf` has one extra -1 at the end, so the -1 id of
+    items without a path maps to no node.
+
+    `peaks` and `counts` are (nets, nodes) arrays with the max value (-inf if
+    none) and the item count of every net under every node, reduced once at
+    the deepest nodes `REDUCE_ROWS` items at a time and then folded into the
+    parents level by level.
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        offsets: np.ndarray,
+        path: np.ndarray,
+        net: np.ndarray,
+        value: np.ndarray,
+        nets: int,
+    ) -> None:
+        self.labels: List[str] = []
+        self.__build(data, np.asarray(offsets, dtype=np.intp))
+        # children of every node as slices of `order`, roots first
+        self.order = np.argsort(self.parent, kind="stable")
+        self.bounds = np.zeros(len(self) + 2, dtype=np.intp)
+        np.cumsum(
+            np.bincount(self.parent + 1, minlength=len(self) + 1), out=self.bounds[1:]
+        )
+        self.__reduce(path, net, value, nets)
+
+    def __build(self, data: np.ndarray, offsets: np.ndarray) -> None:
+        starts, ends = offsets[:-1], offsets[1:]
+        slashes = np.flatnonzero(data == ord(SEPARATOR))
+        # the paths still being walked, where their next segment starts and
+        # the first of `slashes` after it
+        walk = np.flatnonzero(ends > starts)
+        position = starts[walk]
+        cursor = np.searchsorted(slashes, position)
+
+        labels: Dict[bytes, int] = {}
+        parent, depth, label = [], [], []
+        current = np.full(len(starts) + 1, -1, dtype=np.intp)
+        count = 0
+        level = 0
+        while len(walk):
+            end = ends[walk]
+            slash = (
+                slashes[np.minimum(cursor, len(slashes) - 1)] if len(slashes) else end
+            )
+            more = (cursor < len(slashes)) & (slash < end)
+            end = np.where(more, slash, end)
+            (codes,), first = intern_slices([(data, position, end - position)])
+            names = [data[position[at] : end[at]].tobytes() for at in first.tolist()]
+            # a node is a distinct (parent, name) pair
+            above = current[walk]
+            keys = (above + 1) * len(names) + codes
+            keys, inverse = np.unique(keys, return_inverse=True)
+            current[walk] = count + inverse.ravel()
+            count += len(keys)
+            parent.append(keys // len(names) - 1)
+            depth.append(np.full(len(keys), level, dtype=np.intp))
+            label.append(
+                np.array(
+                    [
+                        labels.setdefault(names[name], len(labels))
+                        for name in (keys % len(names)).tolist()
+                    ],
+                    dtype=np.int32,
+                )
+            )
+            walk, position, cursor = walk[more], end[more] + 1, cursor[more] + 1
+            level += 1
+        self.labels = [name.decode() for name in labels]
+        self.parent = np.concatenate([np.zeros(0, dtype=np.intp)] + parent)
+        self.depth = np.concatenate([np.zeros(0, dtype=np.intp)] + depth)
+        self.label = np.concatenate([np.zeros(0, dtype=np.int32)] + label)
+        self.leaf = current
+
+    def __reduce(
+        self, path: np.ndarray, net: np.ndarray, value: np.ndarray, nets: int
+    ) -> None:
+        peaks = np.full(nets * len(self), -np.inf)
+        counts = np.zeros(nets * len(self), dtype=np.intp)
+        for start in range(0, len(path), REDUCE_ROWS):
+            rows = slice(start, start + REDUCE_ROWS)
+            nodes = self.leaf[path[rows]]
+            inside = np.flatnonzero(nodes >= 0)
+            key = net[rows][inside].astype(np.intp) * len(self) + nodes[inside]
+            np.maximum.at(peaks, key, value[rows][inside])
+            counts += np.bincount(key, minlength=nets * len(self))
+        peaks = peaks.reshape(nets, len(self))
+        counts = counts.reshape(nets, len(self))
+        for level in range(int(self.depth.max(initial=0)), 0, -1):
+            at = np.flatnonzero(self.depth == level)
+            np.maximum.at(peaks, (slice(None), self.parent[at]), peaks[:, at])
+            np.add.at(counts, (slice(None), self.parent[at]), counts[:, at])
+        self.peaks, self.counts = peaks, counts
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def name(self, node: int) -> str:
+        return self.labels[self.label[node]]
+
+    def full_path(self, node: int) -> str:
+        """Path of a node, its ancestors' names joined by the separator."""
+        names = []
+        while node >= 0:
+            names.append(self.name(node))
+            node = int(self.parent[node])
+        return SEPARATOR.join(reversed(names))
+
+    def children(self, node: int = -1) -> np.ndarray:
+        """Child nodes of `node`, the roots for -1."""
+        return self.order[self.bounds[node + 1] : self.bounds[node + 2]]
+
+    def find(self, path: str) -> int:
+        """Node of `path`, -1 if no item path starts with it."""
+        node = -1
+        for name in path.split(SEPARATOR):
+            found = -1
+            for child in self.children(node).tolist():
+                if self.name(child) == name:
+                    found = child
+                    break
+            if found < 0:
+                return -1
+            node = found
+        return node
+
+    def ancestors(self, nodes: np.ndarray, depth: int) -> np.ndarray:
+        """Ancestor of every node at `depth`, -1 for nodes above it."""
+        nodes = np.asarray(nodes, dtype=np.intp)
+        node_depth = np.where(nodes >= 0, self.depth[nodes], -1)
+        nodes = np.where(node_depth >= depth, nodes, -1)
+        for _ in range(int(self.depth.max(initial=0)) - depth):
+            deeper = (nodes >= 0) & (self.depth[nodes] > depth)
+            if not deeper.any():
+                break
+            nodes[deeper] = self.parent[nodes[deeper]]
+        return nodes
+
+    def under(self, node: int, path: np.ndarray) -> np.ndarray:
+        """Mask of the path ids at or below `node`."""
+        return self.ancestors(self.leaf[path], int(self.depth[node])) == node
+
+    def max_array(self, code: int) -> np.ndarray:
+        """Max value of a net code under every node, 0.0 for nodes without it."""
+        if code >= len(self.peaks):
+            return np.zeros(len(self))
+        return np.where(self.counts[code] > 0, self.peaks[code], 0.0)
+
+    def count_array(self, code: int) -> np.ndarray:
+        """Number of items of a net code under every node."""
+        if code >= len(self.counts):
+            return np.zeros(len(self), dtype=np.intp)
+        return self.counts[code]
+
+
+def intern_slices(
+    sources: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+) -> Tuple[List[np.ndarray], np.ndarray]:
+    """Integer codes of byte slices, equal for equal bytes.
+
+    Every source is a `(data, starts, lengths)` triple naming the slices
+    `data[start : start + length]`, the codes are shared by all sources.
+    Slices are hashed to 64 bits `HASH_ROWS` at a time, so no temporary is
+    as wide as the longest slice, and every slice is then compared with the
+    first slice of the same code. Should two different slices ever share a
+    hash, all of them are hashed again with another seed.
+
+    Returns the codes of every source and, for every code, the position of
+    its first slice in the sources laid end to end.
+    """
+    readers = [_WordReader(data) for data, _, _ in sources]
+    bounds = np.cumsum([0] + [len(starts) for _, starts, _ in sources])
+    seed = 0
+    while True:
+        digests = np.empty(bounds[-1], dtype=np.uint64)
+        for source, (reader, (_, starts, lengths)) in enumerate(zip(readers, sources)):
+            mine = digests[bounds[source] : bounds[source + 1]]
+            for rows in _chunks(len(starts)):
+                mine[rows] = _hash(reader, starts[rows], lengths[rows], seed)
+        _, first, codes = np.unique(digests, return_index=True, return_inverse=True)
+        codes = codes.ravel()
+        del digests
+        if _verify(readers, sources, bounds, first, codes):
+            sides = range(len(sources))
+            return [codes[bounds[i] : bounds[i + 1]] for i in sides], first
+        seed += 1
+
+
+class _WordReader:
+    """The 8 bytes of `data` at any offset as one little-endian integer, the
+    bytes past the end read as zeros."""
+
+    def __init__(self, data: np.ndarray) -> None:
+        data = np.ascontiguousarray(data, dtype=np.uint8)
+        # offsets up to `split` read the data in place, the few after it a
+        # zero padded copy of the tail
+        self.split = max(len(data) - 7, 0)
+        tail = np.zeros(len(data) - self.split + 8, dtype=np.uint8)
+        tail[: len(data) - self.split] = data[self.split :]
+        self.body = _every_offset(data, self.split)
+        self.tail = _every_offset(tail, len(tail) - 7)
+
+    def __getitem__(self, offsets: np.ndarray) -> np.ndarray:
+        words = self.body[np.minimum(offsets, max(self.split - 1, 0))]
+        past = np.flatnonzero(offsets >= self.split)
+        words[past] = self.tail[offsets[past] - self.split]
+        return words
+
+
+def _every_offset(data: np.ndarray, count: int) -> np.ndarray:
+    if count <= 0:
+        return np.zeros(1, dtype="<u8")
+    return as_strided(
+        data[:8].view("<u8"), shape=(count,), strides=(1,), writeable=False
+    )
+
+
+def _words(
+    reader: _WordReader, starts: np.ndarray, lengths: np.ndarray
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Rows still inside their slice and their next 8 bytes, zeroed past the
+    end of the slice, one yield per word position."""
+    alive = np.flatnonzero(lengths > 0)
+    position = 0
+    while len(alive):
+        left = lengths[alive] - position
+        words = reader[starts[alive] + position]
+        short = np.flatnonzero(left < 8)
+        words[short] &= (_ONE << (left[short].astype(np.uint64) << _THREE)) - _ONE
+        yield alive, words
+        position += 8
+        alive = alive[left > 8]
+
+
+def _hash(
+    reader: _WordReader, starts: np.ndarray, lengths: np.ndarray, seed: int
+) -> np.ndarray:
+    digests = _mix(np.full(len(starts), np.uint64(seed) + _GOLDEN, dtype=np.uint64))
+    for alive, words in _words(reader, starts, lengths):
+        digests[alive] = _mix(digests[alive] ^ words)
+    return _mix(digests ^ lengths.astype(np.uint64))
+
+
+def _verify(
+    readers: List[_WordReader],
+    sources: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    bounds: np.ndarray,
+    first: np.ndarray,
+    codes: np.ndarray,
+) -> bool:
+    """Whether every slice equals the first slice of its code."""
+    owner = np.searchsorted(bounds, first, side="right") - 1
+    for source, (reader, (_, starts, lengths)) in enumerate(zip(readers, sources)):
+        for rows in _chunks(len(starts)):
+            mine = codes[bounds[source] : bounds[source + 1]][rows]
+            for other, (other_reader, (_, other_starts, other_lengths)) in enumerate(
+                zip(readers, sources)
+            ):
+                at = np.flatnonzero(owner[mine] == other)
+                there = first[mine[at]] - bounds[other]
+                size = lengths[rows][at]
+                if not np.array_equal(size, other_lengths[there]):
+                    return False
+                here = starts[rows][at]
+                pairs = zip(
+                    _words(reader, here, size),
+                    _words(other_reader, other_starts[there], size),
+                )
+                for (_, words), (_, other_words) in pairs:
+                    if not np.array_equal(words, other_words):
+                        return False
+    return True
+
+
+def _chunks(count: int) -> Iterator[slice]:
+    return (slice(start, start + HASH_ROWS) for start in range(0, count, HASH_ROWS))
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, in place."""
+    values ^= values >> np.uint64(30)
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+_ONE = np.uint64(1)
+_THREE = np.uint64(3)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
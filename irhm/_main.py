@@ -1,30 +1,302 @@
-from argparse import ArgumentParser
+import sys
+from argparse import ArgumentParser, Namespace
+from typing import List, Optional, Sequence
 
-from .ir import from_file
-from .ui import HeatmapApp
+DEFAULT_ARRAY = "10x10"
 
 
-def main() -> int:
-    default_array = "10x10"
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["render"]:
+        return render_main(argv[1:])
+    if argv[:1] == ["diff"]:
+        return diff_main(argv[1:])
 
-    parser = ArgumentParser(description="IR-Drop Heatmap")
+    parser = ArgumentParser(
+        description="IR-Drop Heatmap",
+        epilog="run 'irhm render -h' for the headless batch mode, "
+        "'irhm diff -h' to compare two runs",
+    )
+    add_input_arguments(parser)
     parser.add_argument(
-        "file",
+        "--watch",
+        action="store_true",
+        help="keep reading lines appended to the input file and update in place",
+    )
+    add_window_arguments(parser)
+    args = parser.parse_args(argv)
+    check_input_arguments(parser, args, [args.file])
+    start_profile(args)
+    if args.watch:
+        from ._reader import splittable
+
+        if args.out_of_core:
+            parser.error("--watch cannot be combined with --out-of-core")
+        if not splittable(args.file):
+            parser.error("--watch needs an uncompressed regular file")
+
+    # 只有打开窗口时才导入 Qt
+    from .ui import HeatmapApp
+
+    app = HeatmapApp(
+        [],
+        array=parse_array(args.array),
+        finer=args.finer,
+    )
+    app.show()
+    # 窗口先显示，文件在后台读取
+    app.window.load(
+        args.file,
+        watch=args.watch,
+        cache=not args.no_cache,
+        rebuild_cache=args.rebuild_cache,
+        workers=args.jobs,
+        out_of_core=args.out_of_core,
+        spill_dir=args.spill_dir,
+    )
+    return app.exec()
+
+
+def render_main(argv: List[str]) -> int:
+    """无界面批量输出热力图和压降表格"""
+    parser = ArgumentParser(
+        prog="irhm render",
+        description="Render heatmaps and drop tables without a window",
+    )
+    add_input_arguments(parser)
+    parser.add_argument(
+        "--pairs",
         type=str,
-        help="input file",
+        help="net pairs to render, e.g. 'VCC:VSS,VCCA:VSSA', default: supply and "
+        "ground nets matched by name",
     )
     parser.add_argument(
-        "--array",
+        "-o",
+        "--output",
+        type=str,
+        help="output directory, default='.'",
+        default=".",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        help="comma separated image formats, png and/or svg, default='png'",
+        default="png",
+    )
+    parser.add_argument(
+        "--table",
+        type=str,
+        help="comma separated table formats, csv and/or json, default='csv,json'",
+        default="csv,json",
+    )
+    parser.add_argument(
+        "--metric",
         type=str,
-        help=f"array of heatmap, deafult={default_array!r}",
-        default=default_array,
+        help="per-tile statistic summed over each pair, one of max, count, mean, "
+        "p95, p99 and density, default='max'",
+        default="max",
+    )
+    parser.add_argument(
+        "--dashboard",
+        action="store_true",
+        help="also draw all pairs side by side on one color scale",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    check_input_arguments(parser, args, [args.file])
+    start_profile(args)
+
+    from .ir import from_file
+    from .render import domain_pairs, parse_pairs, render
+
+    try:
+        pairs = parse_pairs(args.pairs) if args.pairs else None
+    except ValueError as e:
+        parser.error(str(e))
+    collection = from_file(
+        args.file,
+        cache=not args.no_cache,
+        rebuild_cache=args.rebuild_cache,
+        workers=args.jobs,
+        out_of_core=args.out_of_core,
+        spill_dir=args.spill_dir,
+    )
+    if pairs is None:
+        pairs = domain_pairs(list(collection.keys()))
+        if not pairs:
+            parser.error("no supply/ground pairs found, use --pairs")
+    try:
+        written = render(
+            collection,
+            pairs,
+            parse_array(args.array),
+            args.output,
+            formats=[f for f in args.format.split(",") if f],
+            tables=[f for f in args.table.split(",") if f],
+            jobs=args.jobs,
+            metric=args.metric,
+            dashboard=args.dashboard,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    for path in written:
+        print(path)
+    return 0
+
+
+def diff_main(argv: List[str]) -> int:
+    """对比两次仿真结果，热力图显示每个分块的变化"""
+    parser = ArgumentParser(
+        prog="irhm diff",
+        description="Compare two IR runs tile by tile",
+    )
+    parser.add_argument(
+        "before",
+        type=str,
+        help="input file of the reference run",
+    )
+    parser.add_argument(
+        "after",
+        type=str,
+        help="input file of the run compared against it",
+    )
+    add_load_arguments(parser)
+    parser.add_argument(
+        "--regressions",
+        type=int,
+        metavar="N",
+        help="print the N instances whose value grew the most instead of "
+        "opening a window",
+    )
+    parser.add_argument(
+        "--nets",
+        type=str,
+        help="comma separated nets the regressions are limited to",
+    )
+    add_window_arguments(parser)
+    args = parser.parse_args(argv)
+    check_input_arguments(parser, args, [args.before, args.after])
+    start_profile(args)
+    if args.before == args.after == "-":
+        parser.error("only one input can be read from stdin")
+    kwargs = {
+        "cache": not args.no_cache,
+        "rebuild_cache": args.rebuild_cache,
+        "workers": args.jobs,
+        "out_of_core": args.out_of_core,
+        "spill_dir": args.spill_dir,
+    }
+
+    if args.regressions is not None:
+        from .diff import load_pair, regressions
+
+        before, after = load_pair(args.before, args.after, **kwargs)
+        nets = [net for net in args.nets.split(",") if net] if args.nets else None
+        print("net\tpath\tbefore\tafter\tdelta")
+        for item in regressions(before, after, args.regressions, nets):
+            print(
+                f"{item.net}\t{item.path}\t{item.before:.2f}\t{item.after:.2f}"
+                f"\t{item.delta:+.2f}"
+            )
+        return 0
+
+    from .ui import HeatmapApp
 
     app = HeatmapApp(
         [],
-        collection=from_file(args.file),
-        array=tuple(map(int, args.array.split("x"))),
+        array=parse_array(args.array),
+        finer=args.finer,
     )
     app.show()
+    app.window.load_diff(args.before, args.after, **kwargs)
     return app.exec()
+
+
+def add_input_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "file",
+        type=str,
+        help="input file, may be gzip/bz2/xz compressed, '-' reads stdin",
+    )
+    add_load_arguments(parser)
+
+
+def add_window_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--finer",
+        type=int,
+        choices=range(5),
+        metavar="N",
+        help="also bin up to 2**N times finer than --array, for zooming in "
+        "the window, 0 to 4, default=0",
+        default=0,
+    )
+
+
+def add_load_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--array",
+        type=str,
+        help=f"array of heatmap, deafult={DEFAULT_ARRAY!r}",
+        default=DEFAULT_ARRAY,
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="neither read nor write the binary cache next to the input file",
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="re-parse the input file and rewrite its binary cache",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="number of processes used to parse and render, default=1",
+        default=1,
+    )
+    parser.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help="keep the items in the memory-mapped cache instead of in memory",
+    )
+    parser.add_argument(
+        "--spill-dir",
+        type=str,
+        metavar="DIR",
+        help="directory of the temporary files of --out-of-core, default: next "
+        "to the input file",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the time, calls, items and peak memory of every stage at exit",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        type=str,
+        metavar="FILE",
+        help="write the stages as a Chrome trace JSON file at exit",
+    )
+
+
+def check_input_arguments(
+    parser: ArgumentParser, args: Namespace, files: Sequence[str]
+) -> None:
+    # 核外模式直接使用缓存文件里的列
+    if args.out_of_core and (args.no_cache or "-" in files):
+        parser.error("--out-of-core needs the cache of an input file")
+    if args.spill_dir and not args.out_of_core:
+        parser.error("--spill-dir needs --out-of-core")
+
+
+def start_profile(args: Namespace) -> None:
+    # 未开启时各阶段只多一次判断
+    if args.profile or args.profile_trace:
+        from ._profile import enable
+
+        enable(args.profile_trace)
+
+
+def parse_array(text: str) -> tuple:
+    return tuple(map(int, text.split("x")))
@@ -0,0 +1,194 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple, Union, final
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# `IRHM_PROFILE=1` prints the summary at exit, `IRHM_PROFILE=trace.json`
+# writes a Chrome trace instead, unset, empty, 0 or false leave it off
+ENV = "IRHM_PROFILE"
+
+
+@final
+class Span:
+    """One timed run of a stage, a context manager.
+
+    `items` may be set while the stage runs, e.g. through `current()`, to
+    record how many points, tiles or rows it handled.
+    """
+
+    __slots__ = ("items", "name", "start")
+
+    def __init__(self, name: str, items: Optional[int] = None) -> None:
+        self.name = name
+        self.items = items
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        _stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        end = time.perf_counter()
+        _stack().pop()
+        thread = threading.current_thread()
+        with _lock:
+            _threads.setdefault(thread.ident, thread.name)
+            _records.append(
+                (self.name, self.start, end, thread.ident, self.items, peak_rss())
+            )
+
+
+# stand-in for `current()` while profiling is off, never entered so setting
+# its items records nothing
+_OFF = Span("")
+_enabled = False
+_trace: Optional[str] = None
+_lock = threading.Lock()
+_local = threading.local()
+# (name, start, end, thread id, items, peak rss)
+_records: List[Tuple[str, float, float, int, Optional[int], Optional[int]]] = []
+_threads: Dict[int, str] = {}
+_origin = time.perf_counter()
+
+
+def _stack() -> List[Span]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def enable(trace: Optional[str] = None) -> None:
+    """Start recording, `report` runs at exit: it writes a Chrome trace to
+    `trace` if given, otherwise prints the summary to stderr."""
+    global _enabled, _trace
+    if not _enabled:
+        atexit.register(report)
+    _enabled, _trace = True, trace
+
+
+def current() -> Span:
+    """Innermost running stage of this thread, the no-op span if none."""
+    stack = _stack() if _enabled else None
+    return stack[-1] if stack else _OFF
+
+
+def profiled(
+    name: str, items: Optional[Callable[[Any], int]] = None
+) -> Callable[[Callable], Callable]:
+    """Decorator timing every call as stage `name`, `items(result)` counts
+    what the call handled. While disabled the only cost is one check."""
+
+    def decorate(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name) as span:
+                result = func(*args, **kwargs)
+                if items is not None:
+                    span.items = items(result)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident memory of the process in bytes, None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def summary(file: Optional[TextIO] = None) -> None:
+    """Print calls, items, total/mean/max wall time and the peak RSS seen at
+    the end of every stage, in order of first call. Nested stages are also
+    counted in their parents' time."""
+    file = sys.stderr if file is None else file
+    with _lock:
+        records = list(_records)
+    stages: Dict[str, list] = {}
+    for name, start, end, _, items, rss in records:
+        row = stages.setdefault(name, [0, None, 0.0, 0.0, None])
+        row[0] += 1
+        if items is not None:
+            row[1] = (row[1] or 0) + items
+        row[2] += end - start
+        row[3] = max(row[3], end - start)
+        if rss is not None:
+            row[4] = max(row[4] or 0, rss)
+    width = max([len(name) for name in stages] + [5])
+    print(
+        f"{'stage':<{width}} {'calls':>7} {'items':>12} {'total s':>10}"
+        f" {'mean ms':>10} {'max ms':>10} {'rss MiB':>9}",
+        file=file,
+    )
+    for name, (calls, items, total, longest, rss) in stages.items():
+        print(
+            f"{name:<{width}} {calls:>7} {'-' if items is None else items:>12}"
+            f" {total:>10.3f} {total / calls * 1e3:>10.2f} {longest * 1e3:>10.2f}"
+            f" {'-' if rss is None else f'{rss / 2**20:.1f}':>9}",
+            file=file,
+        )
+
+
+def write_trace(file: Union[str, Path]) -> None:
+    """Write the stages as complete events of the Chrome trace format, for
+    chrome://tracing or Perfetto, one track per thread."""
+    with _lock:
+        records = list(_records)
+        threads = dict(_threads)
+    pid = os.getpid()
+    events: List[Dict[str, Any]] = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": n}}
+        for tid, n in threads.items()
+    ]
+    for name, start, end, tid, items, rss in records:
+        args = {}
+        if items is not None:
+            args["items"] = items
+        if rss is not None:
+            args["peak_rss"] = rss
+        events.append(
+            {
+                "name": name,
+                "cat": "irhm",
+                "ph": "X",
+                "ts": (start - _origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+        )
+    Path(file).write_text(json.dumps({"traceEvents": events}))
+
+
+def report() -> None:
+    if not _records:
+        return
+    if _trace is None:
+        summary()
+    else:
+        write_trace(_trace)
+        print(f"profile written to {_trace}", file=sys.stderr)
+
+
+_value = os.environ.get(ENV, "")
+if _value.lower() not in ("", "0", "false"):
+    enable(_value if _value.endswith(".json") else None)
@@ -1,4 +1,46 @@
+from importlib import import_module
 from importlib.util import find_spec
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+    from PyQt5.QtCore import (
+        QAbstractTableModel,
+        QModelIndex,
+        QObject,
+        QRunnable,
+        Qt,
+        QThreadPool,
+        QTimer,
+    )
+    from PyQt5.QtCore import (
+        pyqtSignal as Signal,
+    )
+    from PyQt5.QtGui import QIcon
+    from PyQt5.QtWidgets import (
+        QAction,
+        QApplication,
+        QComboBox,
+        QHBoxLayout,
+        QHeaderView,
+        QLabel,
+        QMainWindow,
+        QMenu,
+        QMessageBox,
+        QProgressBar,
+        QPushButton,
+        QSizePolicy,
+        QSpinBox,
+        QSplitter,
+        QTableView,
+        QTableWidget,
+        QTableWidgetItem,
+        QTabWidget,
+        QTreeWidget,
+        QTreeWidgetItem,
+        QVBoxLayout,
+        QWidget,
+    )
 
 __all__ = [
     "QApplication",
@@ -7,10 +49,19 @@ __all__ = [
     "QVBoxLayout",
     "QTableWidget",
     "QTableWidgetItem",
+    "QTableView",
+    "QTreeWidget",
+    "QTreeWidgetItem",
+    "QTabWidget",
+    "QAbstractTableModel",
+    "QModelIndex",
     "QHeaderView",
     "QSplitter",
     "QLabel",
     "QComboBox",
+    "QSpinBox",
+    "QProgressBar",
+    "QPushButton",
     "QHBoxLayout",
     "QMenu",
     "QMessageBox",
@@ -18,47 +69,62 @@ __all__ = [
     "QAction",
     "QIcon",
     "Qt",
+    "QTimer",
+    "QObject",
+    "QRunnable",
+    "QThreadPool",
+    "Signal",
     "FigureCanvasQTAgg",
 ]
 
-if find_spec("PyQt5"):
-    from PyQt5.QtWidgets import (
-        QApplication,
-        QMainWindow,
-        QWidget,
-        QVBoxLayout,
-        QTableWidget,
-        QTableWidgetItem,
-        QHeaderView,
-        QSplitter,
-        QLabel,
-        QComboBox,
-        QHBoxLayout,
-        QMenu,
-        QMessageBox,
-        QSizePolicy,
-        QAction,
-    )
-    from PyQt5.QtGui import QIcon
-    from PyQt5.QtCore import Qt
-else:
-    from PySide6.QtWidgets import (
-        QApplication,
-        QMainWindow,
-        QWidget,
-        QVBoxLayout,
-        QTableWidget,
-        QTableWidgetItem,
-        QHeaderView,
-        QSplitter,
-        QLabel,
-        QComboBox,
-        QHBoxLayout,
-        QMenu,
-        QMessageBox,
-        QSizePolicy,
-    )
-    from PySide6.QtGui import QAction, QIcon
-    from PySide6.QtCore import Qt
+# 名称 -> 所在子模块，未列出的都在 QtWidgets
+_LOCATIONS = {
+    "PyQt5": {
+        "QIcon": "QtGui",
+        "Qt": "QtCore",
+        "QAbstractTableModel": "QtCore",
+        "QModelIndex": "QtCore",
+        "QTimer": "QtCore",
+        "QObject": "QtCore",
+        "QRunnable": "QtCore",
+        "QThreadPool": "QtCore",
+        "Signal": "QtCore",
+    },
+    "PySide6": {
+        "QAction": "QtGui",
+        "QIcon": "QtGui",
+        "Qt": "QtCore",
+        "QAbstractTableModel": "QtCore",
+        "QModelIndex": "QtCore",
+        "QTimer": "QtCore",
+        "QObject": "QtCore",
+        "QRunnable": "QtCore",
+        "QThreadPool": "QtCore",
+        "Signal": "QtCore",
+    },
+}
+_RENAMES = {
+    "PyQt5": {"Signal": "pyqtSignal"},
+    "PySide6": {},
+}
+
+
+def binding() -> str:
+    """优先使用 PyQt5，否则使用 PySide6"""
+    return "PyQt5" if find_spec("PyQt5") else "PySide6"
+
 
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+def __getattr__(name: str):
+    """首次访问时才导入 Qt，导入 `_qt` 本身不加载任何 GUI 模块"""
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if name == "FigureCanvasQTAgg":
+        module = import_module("matplotlib.backends.backend_qt5agg")
+        value = module.FigureCanvasQTAgg
+    else:
+        package = binding()
+        location = _LOCATIONS[package].get(name, "QtWidgets")
+        module = import_module(f"{package}.{location}")
+        value = getattr(module, _RENAMES[package].get(name, name))
+    globals()[name] = value
+    return value
@@ -0,0 +1,296 @@
+import bz2
+import gzip
+import hashlib
+import lzma
+import os
+import re
+import sys
+from contextlib import ExitStack
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple, Union, final
+
+import numpy as np
+
+CHUNK_SIZE = 1 << 20
+# bytes before the parsed offset of a watched file hashed by `Snapshot`
+TAIL_SIZE = 4096
+
+_COMMENT = re.compile(rb"#[^\n]*")
+# the bytes `bytes.split()` treats as whitespace
+_SPACE = np.zeros(256, dtype=bool)
+_SPACE[list(b" \t\n\r\x0b\x0c")] = True
+
+
+@dataclass
+class Block:
+    """Columns parsed from a run of whole lines.
+
+    `net` holds codes into `nets`, which are ordered by first appearance.
+    `paths` is every path concatenated, split again by `lengths`.
+    """
+
+    nets: List[str]
+    net: np.ndarray
+    value: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    paths: bytes
+    lengths: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.net)
+
+
+@final
+class Source:
+    """A binary ir.list stream, `-` is stdin, gzip/bz2/xz input is detected
+    from its magic bytes and decompressed on the fly."""
+
+    def __init__(self, file: Union[str, Path]) -> None:
+        # the file stays open until `close`, or is closed again right away
+        # if detecting the compression fails
+        with ExitStack() as stack:
+            if str(file) == "-":
+                self.raw: BinaryIO = sys.stdin.buffer
+                self.total = 0
+            else:
+                self.raw = stack.enter_context(open(file, "rb"))
+                self.total = Path(file).stat().st_size
+            opener = _decompressor(self.raw.peek(6))
+            self.stream: BinaryIO = self.raw if opener is None else opener(self.raw)
+            self.__files = stack.pop_all()
+        self.__read = 0
+
+    def __enter__(self) -> "Source":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.__files.close()
+
+    @property
+    def position(self) -> int:
+        """Bytes consumed from the underlying file, for progress reports."""
+        if self.total:
+            return self.raw.tell()
+        return self.__read
+
+    def chunks(self, size: int = CHUNK_SIZE) -> Iterator[Tuple[bytes, int]]:
+        """Yield runs of whole lines of about `size` bytes, together with the
+        line number the run starts at."""
+        return _lines(self.__read_stream, size)
+
+    def __read_stream(self, size: int) -> bytes:
+        data = self.stream.read(size)
+        self.__read += len(data)
+        return data
+
+
+def splittable(file: Union[str, Path]) -> bool:
+    """Whether `file` is an uncompressed regular file, which `split` can cut
+    into ranges for parallel parsing."""
+    if str(file) == "-" or not Path(file).is_file():
+        return False
+    with open(file, "rb") as f:
+        return _decompressor(f.read(6)) is None
+
+
+def split(file: Union[str, Path], parts: int) -> List[Tuple[int, int]]:
+    """Cut `file` into at most `parts` byte ranges, each starting at the
+    beginning of a line."""
+    size = Path(file).stat().st_size
+    bounds = [0]
+    with open(file, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts - 1, bounds[-1]))
+            f.readline()
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return list(_pairwise(bounds))
+
+
+def _pairwise(values: List[int]) -> Iterator[Tuple[int, int]]:
+    """`itertools.pairwise` of Python 3.10."""
+    return zip(values[:-1], values[1:])  # noqa: RUF007
+
+
+def parse_range(
+    file: Union[str, Path],
+    start: int,
+    end: int,
+    size: int = CHUNK_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> List[Block]:
+    """Parse the bytes `[start, end)` of `file` in chunks of about `size`.
+
+    Line numbers in error messages count from `start`. `progress(done, end)`
+    is called after every chunk with the file position reached.
+    """
+    with open(file, "rb") as f:
+        f.seek(start)
+
+        def read(n: int) -> bytes:
+            return f.read(max(min(n, end - f.tell()), 0))
+
+        blocks = []
+        for data, line in _lines(read, size):
+            blocks.append(parse(data, line))
+            if progress is not None:
+                progress(f.tell(), end)
+        return blocks
+
+
+def line_end(file: Union[str, Path], start: int = 0) -> int:
+    """Offset just past the last newline of `file` at or after `start`, or
+    `start` if there is none, so a line still being written is left out."""
+    end = Path(file).stat().st_size
+    with open(file, "rb") as f:
+        while end > start:
+            begin = max(end - CHUNK_SIZE, start)
+            f.seek(begin)
+            cut = f.read(end - begin).rfind(b"\n")
+            if cut >= 0:
+                return begin + cut + 1
+            end = begin
+    return start
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A growing plain file whose whole lines are parsed up to `offset`.
+
+    `stat` is (inode, mtime_ns, size) as it was before the lines were read,
+    so anything written meanwhile shows up as a change. `tail` hashes the
+    `TAIL_SIZE` bytes just before `offset`: a file rewritten or replaced
+    with longer content grows like an appended one, but no longer matches.
+    """
+
+    stat: Tuple[int, int, int]
+    offset: int
+    tail: bytes
+
+    @classmethod
+    def take(
+        cls, file: Union[str, Path], offset: int, stat: os.stat_result
+    ) -> "Snapshot":
+        return cls(_stat_key(stat), offset, _tail(file, offset))
+
+    def same(self, stat: os.stat_result) -> bool:
+        """Whether nothing was written to the file since."""
+        return _stat_key(stat) == self.stat
+
+    def appended(self, file: Union[str, Path], stat: os.stat_result) -> bool:
+        """Whether `file`, now at `stat`, only had bytes appended since.
+
+        Otherwise it was replaced, truncated or rewritten and has to be read
+        again from the start.
+        """
+        inode, _, size = _stat_key(stat)
+        if inode != self.stat[0] or size <= self.stat[2] or size < self.offset:
+            return False
+        return _tail(file, self.offset) == self.tail
+
+    def grown(self, stat: os.stat_result) -> "Snapshot":
+        """This snapshot at the newer `stat`, for bytes appended after
+        `offset` that do not end a line yet."""
+        return replace(self, stat=_stat_key(stat))
+
+
+def _stat_key(stat: os.stat_result) -> Tuple[int, int, int]:
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _tail(file: Union[str, Path], offset: int) -> bytes:
+    start = max(offset - TAIL_SIZE, 0)
+    with open(file, "rb") as f:
+        f.seek(start)
+        data = f.read(offset - start)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _lines(
+    read: Callable[[int], bytes],
+    size: int,
+) -> Iterator[Tuple[bytes, int]]:
+    rest = b""
+    line = 1
+    while True:
+        data = read(size)
+        if not data:
+            break
+        data = rest + data
+        cut = data.rfind(b"\n") + 1
+        rest = data[cut:]
+        if cut:
+            yield data[:cut], line
+            line += data.count(b"\n", 0, cut)
+    if rest:
+        yield rest, line
+
+
+def _decompressor(magic: bytes) -> Optional[Callable[[BinaryIO], BinaryIO]]:
+    if magic.startswith(b"\x1f\x8b"):
+        return lambda raw: gzip.GzipFile(fileobj=raw)
+    if magic.startswith(b"BZh"):
+        return bz2.BZ2File
+    if magic.startswith(b"\xfd7zXZ\x00"):
+        return lzma.LZMAFile
+    return None
+
+
+def parse(data: bytes, line: int = 1) -> Block:
+    """Parse whole lines of ir.list text, `line` is the number of the first
+    line and only used in error messages."""
+    data = _COMMENT.sub(b"", data)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    space = _SPACE[buf]
+    starts = np.flatnonzero(~space & np.concatenate(([True], space[:-1])))
+    newlines = np.flatnonzero(buf == ord("\n"))
+    counts = np.bincount(
+        np.searchsorted(newlines, starts),
+        minlength=len(newlines) + 1,
+    )
+    bad = np.flatnonzero((counts != 0) & (counts != 5))
+    if len(bad):
+        raise ValueError(
+            f"line {line + bad[0]}: expected 5 columns, got {counts[bad[0]]}"
+        )
+    rows = np.flatnonzero(counts) + line
+    tokens = data.split()
+
+    names, first, inverse = np.unique(
+        np.array(tokens[0::5], dtype=bytes), return_index=True, return_inverse=True
+    )
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    paths = tokens[4::5]
+    return Block(
+        nets=[names[i].decode() for i in order],
+        net=rank[inverse].astype(np.int32),
+        value=_floats(tokens[1::5], rows),
+        x=_floats(tokens[2::5], rows),
+        y=_floats(tokens[3::5], rows),
+        paths=b"".join(paths),
+        lengths=np.fromiter(map(len, paths), dtype=np.int64, count=len(paths)),
+    )
+
+
+def _floats(tokens: List[bytes], rows: np.ndarray) -> np.ndarray:
+    try:
+        return np.array(tokens, dtype=bytes).astype(np.float64)
+    except ValueError:
+        for token, row in zip(tokens, rows):
+            try:
+                float(token)
+            except ValueError:
+                raise ValueError(
+                    f"line {row}: invalid number {token.decode()!r}"
+                ) from None
+        raise
@@ -0,0 +1,104 @@
+from typing import Optional
+
+import numpy as np
+
+# average number of points per grid cell
+CELL_POINTS = 16
+
+
+class GridIndex:
+    """Uniform grid hash over x/y points.
+
+    Points are sorted by grid cell once, so the points of a run of cells in
+    one grid column are a contiguous slice of `order`. Queries only look at
+    the cells overlapping the query region.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray) -> None:
+        self.x = x
+        self.y = y
+        if len(x) == 0:
+            self.x0, self.y0, self.width, self.height = 0.0, 0.0, 1.0, 1.0
+            self.nx, self.ny = 1, 1
+        else:
+            self.x0, self.y0 = float(x.min()), float(y.min())
+            self.width = max(float(x.max()) - self.x0, 1e-12)
+            self.height = max(float(y.max()) - self.y0, 1e-12)
+            cells = max(len(x) // CELL_POINTS, 1)
+            aspect = self.width / self.height
+            self.nx = int(np.clip(np.sqrt(cells * aspect), 1, cells))
+            self.ny = max(cells // self.nx, 1)
+        self.cw = self.width / self.nx
+        self.ch = self.height / self.ny
+        cell = self.__cx(x) * self.ny + self.__cy(y)
+        self.order = np.argsort(cell, kind="stable")
+        self.bounds = np.zeros(self.nx * self.ny + 1, dtype=np.intp)
+        np.cumsum(np.bincount(cell, minlength=self.nx * self.ny), out=self.bounds[1:])
+
+    def __cx(self, x) -> np.ndarray:
+        cx = np.floor((np.asarray(x, dtype=float) - self.x0) / self.cw)
+        return np.clip(cx, 0, self.nx - 1).astype(np.intp)
+
+    def __cy(self, y) -> np.ndarray:
+        cy = np.floor((np.asarray(y, dtype=float) - self.y0) / self.ch)
+        return np.clip(cy, 0, self.ny - 1).astype(np.intp)
+
+    def candidates(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Indexes of the points in every cell overlapping the box."""
+        cx0, cx1 = self.__cx(x0), self.__cx(x1)
+        cy0, cy1 = self.__cy(y0), self.__cy(y1)
+        parts = []
+        for cx in range(cx0, cx1 + 1):
+            start = self.bounds[cx * self.ny + cy0]
+            end = self.bounds[cx * self.ny + cy1 + 1]
+            parts.append(self.order[start:end])
+        return np.concatenate(parts) if parts else self.order[:0]
+
+    def box(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Sorted indexes of the points with `x0 <= x < x1` and `y0 <= y < y1`."""
+        if x1 <= x0 or y1 <= y0:
+            return self.order[:0]
+        index = self.candidates(x0, y0, x1, y1)
+        x, y = self.x[index], self.y[index]
+        return np.sort(index[(x >= x0) & (x < x1) & (y >= y0) & (y < y1)])
+
+    def radius(self, x: float, y: float, r: float) -> np.ndarray:
+        """Sorted indexes of the points within distance `r` of (x, y)."""
+        index = self.candidates(x - r, y - r, x + r, y + r)
+        dx, dy = self.x[index] - x, self.y[index] - y
+        return np.sort(index[dx * dx + dy * dy <= r * r])
+
+    def nearest(
+        self,
+        x: float,
+        y: float,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Indexes of the `k` points nearest to (x, y) ordered by distance,
+        only points where `mask` is true are considered."""
+        k = min(k, len(self.x))
+        if k <= 0:
+            return self.order[:0]
+        # grow a square window of cells around (x, y) until it holds k
+        # points and the k-th distance is inside the window
+        reach = max(self.cw, self.ch)
+        while True:
+            index = self.candidates(x - reach, y - reach, x + reach, y + reach)
+            if mask is not None:
+                index = index[mask[index]]
+            dx, dy = self.x[index] - x, self.y[index] - y
+            dist = dx * dx + dy * dy
+            covers = (
+                x - reach <= self.x0
+                and y - reach <= self.y0
+                and x + reach >= self.x0 + self.width
+                and y + reach >= self.y0 + self.height
+            )
+            if len(index) >= k:
+                best = np.argpartition(dist, k - 1)[:k]
+                if covers or dist[best].max() <= reach * reach:
+                    return index[best[np.argsort(dist[best], kind="stable")]]
+            elif covers:
+                return index[np.argsort(dist, kind="stable")]
+            reach *= 2
@@ -0,0 +1,66 @@
+from typing import Any, Callable, Optional
+
+from ._qt import QObject, QRunnable, Signal
+
+Progress = Callable[[int, int], None]
+
+
+class Cancelled(Exception):
+    """Raised inside a task once it has been cancelled."""
+
+
+class TaskSignals(QObject):
+    # task, done, total; plain objects since byte counts overflow a C int
+    progress = Signal(object, object, object)
+    # task, `task.result` holds the return value
+    finished = Signal(object)
+    # task, error message
+    failed = Signal(object, str)
+
+
+class Task(QRunnable):
+    """Run `func(report)` on a `QThreadPool` thread.
+
+    `func` reports progress through `report(done, total)`, which raises
+    `Cancelled` once `cancel` was called, so long loops stop at their next
+    report. Results and errors are emitted through `signals`, which should
+    be a long-lived object of the receiving thread: the pool deletes the
+    task once it has run, possibly after its owner has let go of it.
+    `callback` is free for the owner to route the result.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[Progress], Any],
+        signals: TaskSignals,
+        callback: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        super().__init__()
+        self.func = func
+        self.callback = callback
+        self.signals = signals
+        self.result: Any = None
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def report(self, done: int, total: int) -> None:
+        if self.cancelled:
+            raise Cancelled
+        self.signals.progress.emit(self, done, total)
+
+    def run(self) -> None:
+        try:
+            self.result = self.func(self.report)
+        except Cancelled:
+            return
+        except Exception as e:  # noqa: BLE001
+            # the task boundary: whatever the job raises has to reach the GUI
+            # thread as `failed`, escaping here would only end the pool thread
+            # and leave the window waiting for a result forever
+            if not self.cancelled:
+                self.signals.failed.emit(self, str(e))
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(self)
@@ -0,0 +1,206 @@
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ._hierarchy import intern_slices
+from .ir import METRICS, Colleciton, Tiles, _largest, from_file
+
+
+@dataclass
+class Regression:
+    net: str
+    path: str
+    before: float
+    after: float
+
+    @property
+    def delta(self) -> float:
+        return self.after - self.before
+
+
+class TilesDiff(Mapping):
+    """Per-tile change between two runs binned onto the same grid, see
+    `make_pyramid`.
+
+    Offers the read side of `Tiles` that the window and `render` use. Tile
+    collections and members are those of the `after` run, while `drop`,
+    the metric arrays and `max_array` are `after` minus `before`. Levels
+    are made by `make_pyramid`, they cannot be pooled or updated.
+    """
+
+    def __init__(self, before: Tiles, after: Tiles) -> None:
+        if before.shape != after.shape or before.origin != after.origin:
+            raise ValueError("tiles of both runs must share the same grid")
+        self.before = before
+        self.after = after
+        self.collection = after.collection
+        self.shape = after.shape
+        self.origin = after.origin
+        self.size = after.size
+        self.drop = lru_cache(maxsize=64)(self.__drop)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self.after)
+
+    def __len__(self) -> int:
+        return len(self.after)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.after
+
+    def __getitem__(self, key: Tuple[int, int]) -> Colleciton:
+        return self.after[key]
+
+    def members(self, col: int, row: int) -> np.ndarray:
+        return self.after.members(col, row)
+
+    def max_array(self, net: str) -> np.ndarray:
+        return self.after.max_array(net) - self.before.max_array(net)
+
+    metric_array = Tiles.metric_array
+    top_k_tiles = Tiles.top_k_tiles
+    array_info = Tiles.array_info
+
+    def aggregate(
+        self, net: str, metrics: Sequence[str] = METRICS
+    ) -> Dict[str, np.ndarray]:
+        old = self.before.aggregate(net, metrics)
+        new = self.after.aggregate(net, metrics)
+        return {metric: new[metric] - old[metric] for metric in metrics}
+
+    def __drop(self, net1: str, net2: str, metric: str = "max") -> np.ndarray:
+        array = self.after.drop(net1, net2, metric) - self.before.drop(
+            net1, net2, metric
+        )
+        array.flags.writeable = False
+        return array
+
+
+def load_pair(
+    before: Union[str, Path],
+    after: Union[str, Path],
+    progress: Optional[Callable[[int, int], None]] = None,
+    **kwargs,
+) -> Tuple[Colleciton, Colleciton]:
+    """Read two files at the same time with `from_file`, `kwargs` go to both.
+
+    `progress(done, total)` reports the bytes of both files together.
+    """
+    done, total = [0, 0], [0, 0]
+
+    def load(side: int, file: Union[str, Path]) -> Colleciton:
+        def report(side_done: int, side_total: int) -> None:
+            done[side], total[side] = side_done, side_total
+            if progress is not None:
+                progress(sum(done), sum(total) if all(total) else 0)
+
+        return from_file(file, progress=report, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(load, 0, before), executor.submit(load, 1, after)]
+        try:
+            return futures[0].result(), futures[1].result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def shared_box(collections: Sequence[Colleciton], expand: float = 1.0) -> tuple:
+    """`get_box` over the union of `collections`."""
+    boxes = [collection.get_box(expand=expand) for collection in collections]
+    return (
+        (min(box[0][0] for box in boxes), min(box[0][1] for box in boxes)),
+        (max(box[1][0] for box in boxes), max(box[1][1] for box in boxes)),
+    )
+
+
+def make_pyramid(
+    before: Colleciton,
+    after: Colleciton,
+    cols: int,
+    rows: int,
+    finer: int = 0,
+    expand: float = 1.0,
+) -> List[TilesDiff]:
+    """`Colleciton.make_pyramid` of both runs over their `shared_box`, every
+    level paired into a `TilesDiff`."""
+    box = shared_box([before, after], expand=expand)
+    return [
+        TilesDiff(old, new)
+        for old, new in zip(
+            before.make_pyramid(cols, rows, finer=finer, box=box),
+            after.make_pyramid(cols, rows, finer=finer, box=box),
+        )
+    ]
+
+
+def join(before: Colleciton, after: Colleciton) -> Tuple[np.ndarray, np.ndarray]:
+    """Indexes of the items of both runs with the same net and path, as two
+    aligned arrays.
+
+    Net names and paths are interned into integer codes shared by both runs,
+    then the runs are joined on the combined code. Paths are interned by a
+    64-bit hash checked against the path bytes, see `intern_slices`. Items
+    without a path are left out, of a (net, path) repeated in one run only
+    the last item counts.
+    """
+    nets = list(dict.fromkeys(before.nets + after.nets))
+    sides, slices = [], []
+    for collection in before, after:
+        columns = collection.columns
+        index = np.flatnonzero(columns.path >= 0)
+        offsets = collection.paths.offsets
+        ids = columns.path[index]
+        starts = offsets[ids]
+        slices.append((collection.paths.data, starts, offsets[ids + 1] - starts))
+        codes = np.array([nets.index(net) for net in collection.nets], np.intp)
+        sides.append((index, codes[columns.net[index]]))
+    path_codes, _ = intern_slices(slices)
+    del slices
+    matched = []
+    for (index, net_codes), paths in zip(sides, path_codes):
+        keys = paths * len(nets) + net_codes
+        # last item of every key
+        keys, last = np.unique(keys[::-1], return_index=True)
+        matched.append((keys, index[len(index) - 1 - last]))
+    _, old, new = np.intersect1d(
+        matched[0][0], matched[1][0], assume_unique=True, return_indices=True
+    )
+    return matched[0][1][old], matched[1][1][new]
+
+
+def regressions(
+    before: Colleciton,
+    after: Colleciton,
+    k: int,
+    nets: Optional[Sequence[str]] = None,
+) -> List[Regression]:
+    """The `k` matched instances whose value grew the most from `before` to
+    `after`, largest first, optionally only those of `nets`."""
+    old, new = join(before, after)
+    if nets is not None:
+        codes = [after.nets.index(net) for net in nets if net in after.nets]
+        mine = np.isin(after.columns.net[new], codes)
+        old, new = old[mine], new[mine]
+    delta = after.columns.value[new] - before.columns.value[old]
+    best = _largest(delta, k)
+    return [
+        Regression(
+            net=after.nets[net],
+            path=after.paths[path],
+            before=value_before,
+            after=value_after,
+        )
+        for net, path, value_before, value_after in zip(
+            after.columns.net[new[best]].tolist(),
+            after.columns.path[new[best]].tolist(),
+            before.columns.value[old[best]].tolist(),
+            after.columns.value[new[best]].tolist(),
+        )
+    ]
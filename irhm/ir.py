@@ -1,10 +1,29 @@
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Tuple, Union
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 
+from . import _cache, _reader
+from ._hierarchy import Hierarchy
+from ._profile import profiled
+from ._spatial import GridIndex
+
 
 @dataclass
 class Item:
@@ -15,13 +34,311 @@ class Item:
     path: Optional[str] = field(default=None, repr=False)
 
 
-class Items(list):
+# number of single appends buffered in Python lists before packing them into arrays
+_FLUSH_SIZE = 1 << 16
+# rows per chunk of the streaming reductions over out-of-core columns
+STREAM_ROWS = 1 << 22
+# per-tile statistics of a net, see `Tiles.aggregate`
+METRICS = ("max", "count", "mean", "p95", "p99", "density")
+# most items of a net kept for exact percentiles, the biggest tiles beyond
+# that get approximate ones
+EXACT_ITEMS = 1 << 22
+# value bins of the per-tile histograms approximate percentiles are read from
+SKETCH_BINS = 256
+
+
+class Paths:
+    """Instance paths stored as one utf-8 blob plus offsets.
+
+    A collection and every subset taken from it share the same `Paths`, items
+    only keep an integer id into it (-1 for no path).
+    """
+
+    def __init__(
+        self,
+        data: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+    ) -> None:
+        self.__data: List[np.ndarray] = [
+            np.zeros(0, dtype=np.uint8) if data is None else data
+        ]
+        self.__offsets: np.ndarray = (
+            np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        )
+        self.__lengths: List[np.ndarray] = []
+        self.__pending: List[bytes] = []
+        self.__size = len(self.__offsets) - 1
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if index < 0:
+            return None
+        offsets = self.offsets
+        return self.data[offsets[index] : offsets[index + 1]].tobytes().decode()
+
+    @property
+    def data(self) -> np.ndarray:
+        self.__consolidate()
+        return self.__data[0]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        self.__consolidate()
+        return self.__offsets
+
+    def add(self, path: Optional[str]) -> int:
+        if path is None:
+            return -1
+        self.__pending.append(path.encode())
+        self.__size += 1
+        if len(self.__pending) >= _FLUSH_SIZE:
+            self.__flush()
+        return self.__size - 1
+
+    def extend(self, data: bytes, lengths: np.ndarray) -> np.ndarray:
+        """Add the paths packed in `data`, return their ids."""
+        self.__flush()
+        start = self.__size
+        self.__data.append(np.frombuffer(data, dtype=np.uint8))
+        self.__lengths.append(np.asarray(lengths, dtype=np.int64))
+        self.__size += len(lengths)
+        return np.arange(start, self.__size, dtype=np.int64)
+
+    def __flush(self) -> None:
+        if not self.__pending:
+            return
+        pending, self.__pending = self.__pending, []
+        self.__data.append(np.frombuffer(b"".join(pending), dtype=np.uint8))
+        self.__lengths.append(np.fromiter(map(len, pending), np.int64, len(pending)))
+
+    def __consolidate(self) -> None:
+        self.__flush()
+        if not self.__lengths:
+            return
+        lengths = np.concatenate(self.__lengths)
+        self.__lengths = []
+        self.__data = [np.concatenate(self.__data)]
+        self.__offsets = np.concatenate(
+            [self.__offsets, self.__offsets[-1] + np.cumsum(lengths)]
+        )
+
+
+@dataclass
+class Columns:
+    """Flat per-item arrays of a collection.
+
+    `net` holds codes into `Colleciton.nets`, `path` holds ids into
+    `Colleciton.paths`.
+    """
+
+    net: np.ndarray
+    value: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    path: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.net)
+
+    def __getitem__(self, index) -> "Columns":
+        return Columns(
+            net=self.net[index],
+            value=self.value[index],
+            x=self.x[index],
+            y=self.y[index],
+            path=self.path[index],
+        )
+
+    def __setitem__(self, index, other: "Columns") -> None:
+        self.net[index] = other.net
+        self.value[index] = other.value
+        self.x[index] = other.x
+        self.y[index] = other.y
+        self.path[index] = other.path
+
+    @classmethod
+    def empty(cls) -> "Columns":
+        return cls(
+            net=np.zeros(0, dtype=np.int32),
+            value=np.zeros(0, dtype=np.float64),
+            x=np.zeros(0, dtype=np.float64),
+            y=np.zeros(0, dtype=np.float64),
+            path=np.zeros(0, dtype=np.int64),
+        )
+
+    @classmethod
+    def spilled(cls, count: int, directory: Optional[Path] = None) -> "Columns":
+        """Zeroed columns of `count` items backed by temporary files in
+        `directory`, the default temporary directory if None."""
+        return cls(
+            net=_spill(count, np.int32, directory),
+            value=_spill(count, np.float64, directory),
+            x=_spill(count, np.float64, directory),
+            y=_spill(count, np.float64, directory),
+            path=_spill(count, np.int64, directory),
+        )
+
+    @classmethod
+    def concat(
+        cls,
+        chunks: Sequence["Columns"],
+        spill: bool = False,
+        directory: Optional[Path] = None,
+    ) -> "Columns":
+        """Join `chunks`, into temporary files in `directory` instead of
+        memory with `spill`."""
+        if not chunks:
+            return cls.empty()
+        if spill:
+            columns = cls.spilled(sum(map(len, chunks)), directory)
+            start = 0
+            for chunk in chunks:
+                columns[start : start + len(chunk)] = chunk
+                start += len(chunk)
+            return columns
+        return cls(
+            net=np.concatenate([c.net for c in chunks]),
+            value=np.concatenate([c.value for c in chunks]),
+            x=np.concatenate([c.x for c in chunks]),
+            y=np.concatenate([c.y for c in chunks]),
+            path=np.concatenate([c.path for c in chunks]),
+        )
+
+
+class Stats:
+    """Bounding box and per-net count, min, max and sum of the values.
+
+    Every chunk added to a collection is reduced into them once, so the box,
+    the value range of a net and the whole-design drop are lookups instead
+    of scans. They are also stored in the cache header. `box` is (x_min,
+    y_min, x_max, y_max), `floors` and `peaks` are inf and -inf for nets
+    without items.
+    """
+
+    def __init__(self, nets: int = 0) -> None:
+        self.box = np.array([np.inf, np.inf, -np.inf, -np.inf])
+        self.counts = np.zeros(nets, dtype=np.intp)
+        self.floors = np.full(nets, np.inf)
+        self.peaks = np.full(nets, -np.inf)
+        self.sums = np.zeros(nets)
+
+    def resize(self, nets: int) -> None:
+        """Grow the per-net arrays to `nets` codes."""
+        extra = nets - len(self.counts)
+        if extra > 0:
+            self.counts = np.concatenate([self.counts, np.zeros(extra, np.intp)])
+            self.floors = np.concatenate([self.floors, np.full(extra, np.inf)])
+            self.peaks = np.concatenate([self.peaks, np.full(extra, -np.inf)])
+            self.sums = np.concatenate([self.sums, np.zeros(extra)])
+
+    def update(self, columns: Columns) -> None:
+        """Reduce the items of `columns`, `STREAM_ROWS` at a time."""
+        for start in range(0, len(columns), STREAM_ROWS):
+            chunk = columns[start : start + STREAM_ROWS]
+            self.resize(int(chunk.net.max()) + 1)
+            nets = len(self.counts)
+            self.box = np.array(
+                [
+                    min(self.box[0], chunk.x.min()),
+                    min(self.box[1], chunk.y.min()),
+                    max(self.box[2], chunk.x.max()),
+                    max(self.box[3], chunk.y.max()),
+                ]
+            )
+            self.counts += np.bincount(chunk.net, minlength=nets)
+            self.sums += np.bincount(chunk.net, weights=chunk.value, minlength=nets)
+            np.minimum.at(self.floors, chunk.net, chunk.value)
+            np.maximum.at(self.peaks, chunk.net, chunk.value)
+
+    def merge(self, other: "Stats") -> None:
+        """Add the items reduced into `other`."""
+        self.resize(len(other.counts))
+        nets = len(other.counts)
+        self.box = np.concatenate(
+            [
+                np.minimum(self.box[:2], other.box[:2]),
+                np.maximum(self.box[2:], other.box[2:]),
+            ]
+        )
+        self.counts[:nets] += other.counts
+        self.sums[:nets] += other.sums
+        np.minimum(self.floors[:nets], other.floors, out=self.floors[:nets])
+        np.maximum(self.peaks[:nets], other.peaks, out=self.peaks[:nets])
+
+    def to_meta(self) -> dict:
+        return {
+            "box": self.box.tolist(),
+            "counts": self.counts.tolist(),
+            "floors": self.floors.tolist(),
+            "peaks": self.peaks.tolist(),
+            "sums": self.sums.tolist(),
+        }
+
+    @classmethod
+    def from_meta(cls, meta: dict) -> "Stats":
+        stats = cls()
+        stats.box = np.array(meta["box"], dtype=np.float64)
+        stats.counts = np.array(meta["counts"], dtype=np.intp)
+        stats.floors = np.array(meta["floors"], dtype=np.float64)
+        stats.peaks = np.array(meta["peaks"], dtype=np.float64)
+        stats.sums = np.array(meta["sums"], dtype=np.float64)
+        return stats
+
+
+class Items(Sequence):
+    """Lazy view of some items of a collection, `Item` objects are only built
+    when iterated or indexed."""
+
+    def __init__(self, collection: "Colleciton", index: np.ndarray) -> None:
+        self.collection = collection
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Items(self.collection, self.index[key])
+        return self.__make(self.collection.columns[self.index[[key]]])[0]
+
+    def __iter__(self) -> Iterator[Item]:
+        columns = self.collection.columns
+        for start in range(0, len(self.index), _FLUSH_SIZE):
+            yield from self.__make(columns[self.index[start : start + _FLUSH_SIZE]])
+
+    def __make(self, columns: Columns) -> List[Item]:
+        nets = self.collection.nets
+        paths = self.collection.paths
+        return [
+            Item(net=nets[n], value=v, x=x, y=y, path=paths[p])
+            for n, v, x, y, p in zip(
+                columns.net.tolist(),
+                columns.value.tolist(),
+                columns.x.tolist(),
+                columns.y.tolist(),
+                columns.path.tolist(),
+            )
+        ]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.collection.columns.value[self.index]
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.collection.columns.x[self.index]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.collection.columns.y[self.index]
+
     def get_max(self) -> float:
-        values = [item.value for item in self]
-        if len(values) == 0:
+        if len(self.index) == 0:
             return 0.0
         else:
-            return max(values)
+            return float(self.values.max())
 
 
 @dataclass
@@ -31,81 +348,743 @@ class ArrayInfo:
     ndarray: np.ndarray
 
 
-class Tiles(defaultdict):
-    def __init__(self) -> None:
-        super().__init__(Colleciton)
-
-    def __getitem__(self, *args, **kwargs) -> "Colleciton":
-        return super().__getitem__(*args, **kwargs)
-
-    def array_info(self, net1: str, net2: str) -> ArrayInfo:
-        x_size, y_size = 0, 0
-        for x, y in self:
-            x_size = max(x_size, x)
-            y_size = max(y_size, y)
-        max_v = None
-        min_v = None
-        array = np.zeros((x_size + 1, y_size + 1))
-        for xy, c in self.items():
-            value = c.calc_drop(net1, net2)
-            array[xy] = value
-            if max_v is None or value > max_v:
-                max_v = value
-            if min_v is None or value < min_v:
-                min_v = value
+class Tiles(Mapping):
+    """Grid of tiles keyed by (col, row), each a `Colleciton` of the items
+    inside it, see `Colleciton.make_tiles`.
+
+    Items are binned once: `source` holds the collection index of every
+    binned item sorted by flat tile index `col * rows + row`, which is kept
+    in `tile`. Tile collections are only built when accessed.
+
+    The max value and item count of every net in every tile are reduced once
+    into (nets, cols, rows) arrays, so the drop of any net pair is an
+    element-wise add. `pool` derives the next coarser level from them without
+    touching the items again. Items appended to the collection later are
+    binned in place with `update`.
+    """
+
+    def __init__(
+        self,
+        collection: Optional["Colleciton"] = None,
+        shape: Tuple[int, int] = (0, 0),
+        origin: Tuple[float, float] = (0.0, 0.0),
+        size: Tuple[float, float] = (1.0, 1.0),
+        source: Optional[np.ndarray] = None,
+        tile: Optional[np.ndarray] = None,
+        base: Optional["Tiles"] = None,
+        reduced: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> None:
+        self.collection = Colleciton() if collection is None else collection
+        self.shape = shape
+        self.origin = origin
+        self.size = size
+        self.base = base
+        if base is None:
+            self.source = np.zeros(0, dtype=np.intp) if source is None else source
+            self.tile = np.zeros(0, dtype=np.intp) if tile is None else tile
+            self.finest, self.factor = self, 1
+            self.peaks, self.counts = self.__reduce() if reduced is None else reduced
+            self.maxima = np.where(self.counts > 0, self.peaks, 0.0)
+            self.drop = lru_cache(maxsize=64)(self.__drop)
+            self.__tiles: Dict[Tuple[int, int], Colleciton] = {}
+            self.__metrics: Dict[Tuple[str, str], np.ndarray] = {}
+        else:
+            self.finest, self.factor = base.finest, base.factor * 2
+            self.repool()
+
+    def __reduce(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Max value (-inf if none) and count of each net in each tile."""
+        nets = len(self.collection.nets)
+        size = self.shape[0] * self.shape[1]
+        columns = self.collection.columns
+        key = columns.net[self.source].astype(np.intp) * size + self.tile
+        peaks = np.full(nets * size, -np.inf)
+        np.maximum.at(peaks, key, columns.value[self.source])
+        counts = np.bincount(key, minlength=nets * size)
+        return peaks.reshape(nets, *self.shape), counts.reshape(nets, *self.shape)
+
+    def update(self, index: np.ndarray) -> bool:
+        """Bin the items at `index`, just appended to the collection, into
+        this finest level in place.
+
+        Only the tiles they land in are touched, coarser levels then have to
+        `repool`. Returns False and changes nothing if any of the items lies
+        outside the grid, the tiles have to be made again in that case.
+        """
+        if self.base is not None:
+            raise ValueError("only the finest level bins items")
+        cols, rows = self.shape
+        columns = self.collection.columns
+        col_index = _bin_axis(columns.x[index], self.origin[0], self.size[0])
+        row_index = _bin_axis(columns.y[index], self.origin[1], self.size[1])
+        inside = (
+            (col_index >= 0)
+            & (col_index < cols)
+            & (row_index >= 0)
+            & (row_index < rows)
+        )
+        if not inside.all():
+            return False
+        keys = (col_index * rows + row_index).astype(np.intp)
+        order = np.argsort(keys, kind="stable")
+        keys, index = keys[order], np.asarray(index, dtype=np.intp)[order]
+        # appended items go after the old ones of the same tile
+        at = np.searchsorted(self.tile, keys, side="right")
+        self.tile = np.insert(self.tile, at, keys)
+        self.source = np.insert(self.source, at, index)
+
+        nets = len(self.collection.nets)
+        if nets > len(self.peaks):
+            grow = (nets - len(self.peaks),) + self.shape
+            self.peaks = np.concatenate([self.peaks, np.full(grow, -np.inf)])
+            self.counts = np.concatenate(
+                [self.counts, np.zeros(grow, dtype=self.counts.dtype)]
+            )
+            self.maxima = np.concatenate([self.maxima, np.zeros(grow)])
+        net_keys = columns.net[index].astype(np.intp) * (cols * rows) + keys
+        np.maximum.at(self.peaks.reshape(-1), net_keys, columns.value[index])
+        np.add.at(self.counts.reshape(-1), net_keys, 1)
+        touched = np.unique(net_keys)
+        self.maxima.reshape(-1)[touched] = self.peaks.reshape(-1)[touched]
+
+        self.drop.cache_clear()
+        self.__metrics = {}
+        for key in np.unique(keys).tolist():
+            self.__tiles.pop(divmod(key, rows), None)
+        return True
+
+    def repool(self) -> None:
+        """Derive this coarser level from its base again, after the finest
+        level was updated."""
+        base = self.base
+        if base is None:
+            raise ValueError("the finest level is not pooled")
+        self.source, self.tile = base.source, base.tile
+        self.peaks = _pool(base.peaks, self.shape, np.maximum, -np.inf)
+        self.counts = _pool(base.counts, self.shape, np.add, 0)
+        self.maxima = np.where(self.counts > 0, self.peaks, 0.0)
+        self.drop = lru_cache(maxsize=64)(self.__drop)
+        self.__tiles = {}
+        self.__metrics = {}
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return np.ndindex(*self.shape)
+
+    def __len__(self) -> int:
+        return self.shape[0] * self.shape[1]
+
+    def __contains__(self, key: object) -> bool:
+        return (
+            isinstance(key, tuple)
+            and len(key) == 2
+            and 0 <= key[0] < self.shape[0]
+            and 0 <= key[1] < self.shape[1]
+        )
+
+    def __getitem__(self, key: Tuple[int, int]) -> "Colleciton":
+        if key not in self:
+            return Colleciton(nets=self.collection.nets, paths=self.collection.paths)
+        key = (int(key[0]), int(key[1]))
+        if key not in self.__tiles:
+            self.__tiles[key] = self.collection.take(self.members(*key))
+        return self.__tiles[key]
+
+    def members(self, col: int, row: int) -> np.ndarray:
+        """Collection indexes of the items in a tile, in insertion order."""
+        finest = self.finest
+        cols, rows = finest.shape
+        first = row * self.factor
+        last = min(first + self.factor, rows)
+        parts = []
+        for fine_col in range(col * self.factor, min((col + 1) * self.factor, cols)):
+            start, end = np.searchsorted(
+                finest.tile, [fine_col * rows + first, fine_col * rows + last]
+            )
+            parts.append(finest.source[start:end])
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+
+    def pool(self) -> "Tiles":
+        """Next coarser level, each tile merging a 2x2 block of these tiles."""
+        return Tiles(
+            self.collection,
+            shape=(-(-self.shape[0] // 2), -(-self.shape[1] // 2)),
+            origin=self.origin,
+            size=(self.size[0] * 2, self.size[1] * 2),
+            base=self,
+        )
+
+    def max_array(self, net: str) -> np.ndarray:
+        """Max value of `net` in every tile, 0.0 for tiles without it."""
+        nets = self.collection.nets
+        if net in nets and nets.index(net) < len(self.maxima):
+            return self.maxima[nets.index(net)]
+        return np.zeros(self.shape)
+
+    def metric_array(self, net: str, metric: str = "max") -> np.ndarray:
+        """One of `METRICS` of `net` in every tile, 0.0 for tiles without it."""
+        return self.aggregate(net, [metric])[metric]
+
+    def aggregate(
+        self, net: str, metrics: Sequence[str] = METRICS
+    ) -> Dict[str, np.ndarray]:
+        """(cols, rows) arrays of some `METRICS` of `net`, 0.0 for tiles
+        without it.
+
+        max and count come from the reduced grids. mean, density (the sum of
+        values per unit area) and the percentiles are computed together in
+        one vectorized pass over the binned items of the net. Percentiles are
+        exact for the smallest tiles holding at most `EXACT_ITEMS` items of
+        the net together, i.e. for every tile unless the net is big. Those of
+        the remaining, biggest tiles are read from per-tile histograms of
+        `SKETCH_BINS` bins. Results are cached per (net, metric).
+        """
+        for metric in metrics:
+            if metric not in METRICS:
+                raise ValueError(f"unknown metric {metric!r}")
+        missing = [metric for metric in metrics if (net, metric) not in self.__metrics]
+        if missing:
+            for metric, array in self.__aggregate(net, missing).items():
+                array.flags.writeable = False
+                self.__metrics[(net, metric)] = array
+        return {metric: self.__metrics[(net, metric)] for metric in metrics}
+
+    def __aggregate(self, net: str, metrics: Sequence[str]) -> Dict[str, np.ndarray]:
+        nets = self.collection.nets
+        if net not in nets or nets.index(net) >= len(self.counts):
+            return {metric: np.zeros(self.shape) for metric in metrics}
+        code = nets.index(net)
+        counts = self.counts[code]
+        result = {}
+        if "max" in metrics:
+            result["max"] = self.maxima[code]
+        if "count" in metrics:
+            result["count"] = counts.astype(np.float64)
+        quantiles = {m: int(m[1:]) / 100 for m in metrics if m.startswith("p")}
+        if not quantiles and "mean" not in metrics and "density" not in metrics:
+            return result
+
+        tiles = len(self)
+        flat_counts = counts.ravel()
+        exact = np.ones(tiles, dtype=bool)
+        if flat_counts.sum() > EXACT_ITEMS:
+            # smallest tiles first while their items fit the budget
+            order = np.argsort(flat_counts, kind="stable")
+            exact[order[np.cumsum(flat_counts[order]) > EXACT_ITEMS]] = False
+        sketch = bool(quantiles) and not exact.all()
+        sums = np.zeros(tiles)
+        parts = []
+        if sketch:
+            low, high = self.collection.value_range(net)
+            width = (high - low) / SKETCH_BINS or 1.0
+            hist = np.zeros(tiles * SKETCH_BINS, dtype=np.intp)
+        for keys, values in self.__net_items(code):
+            sums += np.bincount(keys, values, minlength=tiles)
+            if not quantiles:
+                continue
+            mine = exact[keys]
+            parts.append((keys[mine], values[mine]))
+            if sketch:
+                keys, values = keys[~mine], values[~mine]
+                bins = np.clip((values - low) // width, 0, SKETCH_BINS - 1)
+                hist += np.bincount(
+                    keys * SKETCH_BINS + bins.astype(np.intp),
+                    minlength=tiles * SKETCH_BINS,
+                )
+
+        sums = sums.reshape(self.shape)
+        if "mean" in metrics:
+            result["mean"] = sums / np.maximum(counts, 1)
+        if "density" in metrics:
+            result["density"] = sums / (self.size[0] * self.size[1])
+        if quantiles:
+            keys = np.concatenate([np.zeros(0, dtype=np.intp)] + [k for k, _ in parts])
+            values = np.concatenate([np.zeros(0)] + [v for _, v in parts])
+            values = values[np.lexsort((values, keys))]
+            exact_counts = np.where(exact, flat_counts, 0)
+        for metric, q in quantiles.items():
+            array = _sorted_quantile(values, exact_counts, q)
+            if sketch:
+                approx = _sketch_quantile(
+                    hist.reshape(tiles, SKETCH_BINS),
+                    np.where(exact, 0, flat_counts),
+                    q,
+                    low,
+                    width,
+                )
+                approx = np.minimum(approx, self.maxima[code].ravel())
+                array = np.where(exact, array, approx)
+            result[metric] = array.reshape(self.shape)
+        return result
+
+    def __net_items(self, code: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """(flat tile index at this level, value) of the binned items of net
+        `code`, `STREAM_ROWS` items at a time if the collection is out of
+        core."""
+        finest = self.finest
+        columns = self.collection.columns
+        total = len(finest.source)
+        step = STREAM_ROWS if self.collection.out_of_core else max(total, 1)
+        for start in range(0, total, step):
+            source = finest.source[start : start + step]
+            mine = columns.net[source] == code
+            source, tile = source[mine], finest.tile[start : start + step][mine]
+            if self.factor > 1:
+                col, row = np.divmod(tile, finest.shape[1])
+                tile = col // self.factor * self.shape[1] + row // self.factor
+            yield tile, columns.value[source]
+
+    def __drop(self, net1: str, net2: str, metric: str = "max") -> np.ndarray:
+        """Drop of every tile for a net pair, the sum of a metric of both
+        nets, `drop` memoizes it per pair and metric."""
+        array = self.metric_array(net1, metric) + self.metric_array(net2, metric)
+        array.flags.writeable = False
+        return array
+
+    def top_k_tiles(
+        self, net1: str, net2: str, k: int, metric: str = "max"
+    ) -> List[Tuple[Tuple[int, int], float]]:
+        """The `k` tiles with the largest drop for a net pair as
+        ((col, row), drop), largest first."""
+        drop = self.drop(net1, net2, metric)
+        cols, rows = np.unravel_index(_largest(drop.ravel(), k), drop.shape)
+        return [
+            ((col, row), float(drop[col, row]))
+            for col, row in zip(cols.tolist(), rows.tolist())
+        ]
+
+    @profiled("array_info", items=lambda info: info.ndarray.size)
+    def array_info(self, net1: str, net2: str, metric: str = "max") -> ArrayInfo:
+        array = self.drop(net1, net2, metric)
         return ArrayInfo(
-            max=max_v,
-            min=min_v,
+            max=float(array.max()) if array.size else None,
+            min=float(array.min()) if array.size else None,
             ndarray=array,
         )
 
 
-class Colleciton(defaultdict):
-    def __init__(self) -> None:
-        super().__init__(Items)
+class Colleciton(Mapping):
+    """Items grouped by net, stored column-wise.
+
+    `collection[net]` and `all_items()` return lazy `Items` views, nets are
+    ordered by first appearance like the keys of a dict.
+
+    With `out_of_core` the columns are expected to be memory-mapped, see
+    `from_file`. Joined chunks then go to temporary files in `spill_dir`,
+    the default temporary directory if None, and tiling and
+    queries are streamed over `STREAM_ROWS` rows at a time instead of
+    building whole-column temporaries or a spatial index, so only per-net
+    and per-tile aggregates stay resident.
+
+    Net counts, value ranges and the box come from `stats`, which are
+    reduced once per added chunk.
+    """
+
+    def __init__(
+        self,
+        nets: Optional[List[str]] = None,
+        paths: Optional[Paths] = None,
+        out_of_core: bool = False,
+        spill_dir: Optional[Path] = None,
+    ) -> None:
+        self.nets: List[str] = [] if nets is None else nets
+        self.paths: Paths = Paths() if paths is None else paths
+        self.out_of_core = out_of_core
+        self.spill_dir = spill_dir
+        self.__chunks: List[Columns] = []
+        self.__pending: List[tuple] = []
+        self.__stats = Stats()
+        self.__index: Dict[int, np.ndarray] = {}
+        self.__spatial: Optional[GridIndex] = None
+        self.__hierarchy: Optional[Hierarchy] = None
+
+    def code(self, net: str) -> int:
+        """Code of `net` in `nets`, registered if unseen."""
+        try:
+            return self.nets.index(net)
+        except ValueError:
+            self.nets.append(net)
+            return len(self.nets) - 1
 
     def append(self, item: Item) -> None:
-        self[item.net].append(item)
+        self.__pending.append(
+            (
+                self.code(item.net),
+                item.value,
+                item.x,
+                item.y,
+                self.paths.add(item.path),
+            )
+        )
+        self.__index = {}
+        self.__spatial = None
+        self.__hierarchy = None
+        if len(self.__pending) >= _FLUSH_SIZE:
+            self.__flush()
+
+    def extend(self, columns: Columns, stats: Optional[Stats] = None) -> None:
+        """Append a whole chunk of items coded against `nets` and `paths`.
+
+        `stats` are those of `columns` if already known, e.g. from the cache,
+        otherwise they are reduced from the chunk.
+        """
+        self.__flush()
+        self.__chunks.append(columns)
+        if stats is None:
+            self.__stats.update(columns)
+        else:
+            self.__stats.merge(stats)
+        self.__index = {}
+        self.__spatial = None
+        self.__hierarchy = None
+
+    def __flush(self) -> None:
+        if not self.__pending:
+            return
+        net, value, x, y, path = zip(*self.__pending)
+        self.__pending = []
+        columns = Columns(
+            net=np.array(net, dtype=np.int32),
+            value=np.array(value, dtype=np.float64),
+            x=np.array(x, dtype=np.float64),
+            y=np.array(y, dtype=np.float64),
+            path=np.array(path, dtype=np.int64),
+        )
+        self.__chunks.append(columns)
+        self.__stats.update(columns)
+
+    @property
+    def columns(self) -> Columns:
+        self.__flush()
+        if len(self.__chunks) != 1:
+            self.__chunks = [
+                Columns.concat(
+                    self.__chunks, spill=self.out_of_core, directory=self.spill_dir
+                )
+            ]
+        return self.__chunks[0]
+
+    def __scan(self) -> Iterator[Tuple[int, Columns]]:
+        """(start, chunk) over the columns, a single chunk unless out of core.
+
+        An empty collection still yields one empty chunk.
+        """
+        columns = self.columns
+        step = STREAM_ROWS if self.out_of_core else max(len(columns), 1)
+        for start in range(0, max(len(columns), 1), step):
+            yield start, columns[start : start + step]
+
+    @property
+    def size(self) -> int:
+        """Number of items."""
+        return len(self.columns)
+
+    @property
+    def stats(self) -> Stats:
+        """Box and per-net aggregates, kept up to date as items are added."""
+        self.__flush()
+        self.__stats.resize(len(self.nets))
+        return self.__stats
+
+    def __net_counts(self) -> np.ndarray:
+        """Number of items of each net code."""
+        return self.stats.counts
+
+    def __net_index(self, code: int) -> np.ndarray:
+        """Indexes of the items of a net code, in insertion order."""
+        if code not in self.__index:
+            self.__index[code] = np.concatenate(
+                [
+                    np.flatnonzero(chunk.net == code) + start
+                    for start, chunk in self.__scan()
+                ]
+            )
+        return self.__index[code]
+
+    def __iter__(self) -> Iterator[str]:
+        for code in np.flatnonzero(self.__net_counts()):
+            yield self.nets[code]
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.__net_counts()))
+
+    def __contains__(self, key: object) -> bool:
+        # counts from `stats`, without building the net's index
+        if key not in self.nets:
+            return False
+        return bool(self.__net_counts()[self.nets.index(key)] > 0)
 
     def __getitem__(self, key: str) -> Items:
-        return super().__getitem__(key)
+        if key not in self.nets:
+            return Items(self, np.zeros(0, dtype=np.intp))
+        return Items(self, self.__net_index(self.nets.index(key)))
+
+    def all_items(self) -> Items:
+        codes = np.flatnonzero(self.__net_counts())
+        return Items(
+            self,
+            np.concatenate(
+                [np.zeros(0, dtype=np.intp)]
+                + [self.__net_index(code) for code in codes]
+            ),
+        )
+
+    def take(self, index: np.ndarray) -> "Colleciton":
+        """Subset of the items at `index`, sharing `nets` and `paths`.
+
+        The subset of an out-of-core collection is out of core too.
+        """
+        subset = Colleciton(
+            nets=self.nets,
+            paths=self.paths,
+            out_of_core=self.out_of_core,
+            spill_dir=self.spill_dir,
+        )
+        if self.out_of_core:
+            columns = Columns.spilled(len(index), self.spill_dir)
+            for start in range(0, len(index), STREAM_ROWS):
+                rows = slice(start, start + STREAM_ROWS)
+                columns[rows] = self.columns[index[rows]]
+            subset.extend(columns)
+        else:
+            subset.extend(self.columns[index])
+        return subset
+
+    @property
+    def spatial_index(self) -> GridIndex:
+        """Grid index over the x/y columns, built on first use."""
+        if self.__spatial is None:
+            columns = self.columns
+            self.__spatial = GridIndex(columns.x, columns.y)
+        return self.__spatial
+
+    @property
+    def hierarchy(self) -> Hierarchy:
+        """Tree of the instance paths with per-net aggregates, built on first
+        use.
+
+        Building it needs several arrays as long as the columns, so it is not
+        available out of core, neither are the queries by block.
+        """
+        if self.out_of_core:
+            raise ValueError("the path hierarchy is not available out of core")
+        if self.__hierarchy is None:
+            columns = self.columns
+            self.__hierarchy = Hierarchy(
+                self.paths.data,
+                self.paths.offsets,
+                columns.path,
+                columns.net,
+                columns.value,
+                len(self.nets),
+            )
+        return self.__hierarchy
+
+    def __code(self, net: str) -> int:
+        """Code of `net`, past the end of `nets` if unknown."""
+        return self.nets.index(net) if net in self.nets else len(self.nets)
+
+    def block_drop(self, net1: str, net2: str) -> np.ndarray:
+        """Drop of every node of `hierarchy` for a net pair, the sum of the
+        max value of both nets below it."""
+        hierarchy = self.hierarchy
+        return hierarchy.max_array(self.__code(net1)) + hierarchy.max_array(
+            self.__code(net2)
+        )
+
+    def block_count(self, *nets: str) -> np.ndarray:
+        """Number of items of `nets` below every node of `hierarchy`."""
+        hierarchy = self.hierarchy
+        counts = np.zeros(len(hierarchy), dtype=np.intp)
+        for net in nets:
+            counts += hierarchy.count_array(self.__code(net))
+        return counts
+
+    def top_k_blocks(
+        self, net1: str, net2: str, k: int, depth: int = 0
+    ) -> List[Tuple[str, float]]:
+        """The `k` blocks at hierarchy `depth` with the largest drop for a net
+        pair as (path, drop), largest first. Blocks without items of either
+        net are left out."""
+        hierarchy = self.hierarchy
+        nodes = np.flatnonzero(
+            (hierarchy.depth == depth) & (self.block_count(net1, net2) > 0)
+        )
+        drop = self.block_drop(net1, net2)[nodes]
+        best = _largest(drop, k)
+        return [
+            (hierarchy.full_path(node), value)
+            for node, value in zip(nodes[best].tolist(), drop[best].tolist())
+        ]
+
+    def query_block(self, path: str) -> Items:
+        """Items whose path is `path` or below it."""
+        hierarchy = self.hierarchy
+        node = hierarchy.find(path)
+        if node < 0:
+            return Items(self, np.zeros(0, dtype=np.intp))
+        parts = [
+            np.flatnonzero(hierarchy.under(node, chunk.path)) + start
+            for start, chunk in self.__scan()
+        ]
+        return Items(self, np.concatenate(parts))
+
+    def query_box(self, x0: float, y0: float, x1: float, y1: float) -> Items:
+        """Items with `x0 <= x < x1` and `y0 <= y < y1`, like a tile."""
+        if self.out_of_core:
+            return Items(self, self.__stream_box((x0, y0, x1, y1)))
+        return Items(self, self.spatial_index.box(x0, y0, x1, y1))
+
+    def query_radius(self, x: float, y: float, r: float) -> Items:
+        """Items within distance `r` of (x, y)."""
+        if not self.out_of_core:
+            return Items(self, self.spatial_index.radius(x, y, r))
+        parts = []
+        for start, chunk in self.__scan():
+            dx, dy = chunk.x - x, chunk.y - y
+            parts.append(np.flatnonzero(dx * dx + dy * dy <= r * r) + start)
+        return Items(self, np.concatenate(parts))
+
+    def __stream_box(self, region: Tuple[float, float, float, float]) -> np.ndarray:
+        """Indexes of the items in `region`, scanned chunk by chunk."""
+        x0, y0, x1, y1 = region
+        parts = []
+        for start, chunk in self.__scan():
+            x, y = chunk.x, chunk.y
+            mask = (x >= x0) & (x < x1) & (y >= y0) & (y < y1)
+            parts.append(np.flatnonzero(mask) + start)
+        return np.concatenate(parts)
+
+    def __stream_largest(
+        self,
+        k: int,
+        select: Callable[[Columns], Tuple[np.ndarray, np.ndarray]],
+    ) -> np.ndarray:
+        """Indexes of the `k` items with the largest score, largest first,
+        ties in index order.
+
+        `select(chunk)` returns the ascending positions of the candidates in
+        a chunk and their scores, only the best `k` so far are kept between
+        chunks.
+        """
+        index = np.zeros(0, dtype=np.intp)
+        scores = np.zeros(0)
+        for start, chunk in self.__scan():
+            position, score = select(chunk)
+            index = np.concatenate([index, position + start])
+            scores = np.concatenate([scores, score])
+            best = _largest(scores, k)
+            index, scores = index[best], scores[best]
+        return index
 
-    def all_items(self) -> list:
-        items = []
-        for x in self.values():
-            items.extend(x)
-        return items
+    def nearest_k(
+        self,
+        x: float,
+        y: float,
+        k: int,
+        net: Optional[str] = None,
+    ) -> Items:
+        """The `k` items nearest to (x, y), closest first, optionally only
+        those of `net`."""
+        code = None
+        if net is not None:
+            if net not in self.nets:
+                return Items(self, np.zeros(0, dtype=np.intp))
+            code = self.nets.index(net)
+        if self.out_of_core:
+
+            def select(chunk: Columns) -> Tuple[np.ndarray, np.ndarray]:
+                if code is None:
+                    position = np.arange(len(chunk))
+                else:
+                    position = np.flatnonzero(chunk.net == code)
+                dx, dy = chunk.x[position] - x, chunk.y[position] - y
+                return position, -(dx * dx + dy * dy)
+
+            return Items(self, self.__stream_largest(k, select))
+        mask = None if code is None else self.columns.net == code
+        return Items(self, self.spatial_index.nearest(x, y, k, mask))
+
+    def top_k(
+        self,
+        net: str,
+        k: int,
+        region: Optional[Tuple[float, float, float, float]] = None,
+        block: Optional[str] = None,
+    ) -> Items:
+        """The `k` items of `net` with the largest value, largest first.
+
+        `region` limits the search to a box (x0, y0, x1, y1) like `query_box`,
+        `block` to the items at or below a path like `query_block`. Only the
+        selected items are sorted, so this stays linear in the number of
+        items for small `k`.
+        """
+        node = -1 if block is None else self.hierarchy.find(block)
+        if net not in self.nets or (block is not None and node < 0):
+            return Items(self, np.zeros(0, dtype=np.intp))
+        code = self.nets.index(net)
+        if self.out_of_core:
+
+            def select(chunk: Columns) -> Tuple[np.ndarray, np.ndarray]:
+                position = np.flatnonzero(chunk.net == code)
+                if region is not None:
+                    x, y = chunk.x[position], chunk.y[position]
+                    x0, y0, x1, y1 = region
+                    position = position[(x >= x0) & (x < x1) & (y >= y0) & (y < y1)]
+                if block is not None:
+                    position = position[
+                        self.hierarchy.under(node, chunk.path[position])
+                    ]
+                return position, chunk.value[position]
+
+            return Items(self, self.__stream_largest(k, select))
+        if region is None:
+            index = self.__net_index(code)
+        else:
+            index = self.spatial_index.box(*region)
+            index = index[self.columns.net[index] == code]
+        if block is not None:
+            index = index[self.hierarchy.under(node, self.columns.path[index])]
+        return Items(self, index[_largest(self.columns.value[index], k)])
 
     def calc_drop(self, net1: str, net2: str) -> float:
-        return self[net1].get_max() + self[net2].get_max()
+        return self.value_range(net1)[1] + self.value_range(net2)[1]
+
+    def value_range(self, net: str) -> Tuple[float, float]:
+        """Min and max value of `net`, (0.0, 0.0) if it has no items."""
+        if net not in self.nets:
+            return 0.0, 0.0
+        code = self.nets.index(net)
+        counts = self.__net_counts()
+        if code >= len(counts) or counts[code] == 0:
+            return 0.0, 0.0
+        stats = self.stats
+        return float(stats.floors[code]), float(stats.peaks[code])
 
     def get_box(
         self,
         origin: Optional[Tuple[float, float]] = None,
         expand: float = 1.0,
     ) -> tuple:
-        x_min, x_max = None, None
-        y_min, y_max = None, None
-        if origin is not None:
-            x_min, y_min = origin
-        for item in self.all_items():
-            if origin is None:
-                if x_min is None or item.x < x_min:
-                    x_min = item.x
-                if x_max is None or item.x > x_max:
-                    x_max = item.x
-            if y_min is None or item.y < y_min:
-                y_min = item.y
-            if y_max is None or item.y > y_max:
-                y_max = item.y
+        stats = self.stats
+        if not stats.counts.any():
+            raise ValueError("empty collection has no box")
+        box = stats.box.tolist()
+        x_min, y_min = box[:2] if origin is None else origin
+        x_max, y_max = box[2:]
         x_min -= expand
         y_min -= expand
         x_max += expand
         y_max += expand
         return (x_min, y_min), (x_max, y_max)
 
+    @profiled("make_tiles", items=lambda tiles: len(tiles.source))
     def make_tiles(self, cols: int, rows: int, **kwargs) -> Tiles:
-        box = self.get_box(
+        """`cols` x `rows` tiles over `get_box(origin, expand)`, or over
+        `box` ((x_min, y_min), (x_max, y_max)) when given, e.g. to bin several
+        collections onto the same grid."""
+        box = kwargs.get("box") or self.get_box(
             origin=kwargs.get("origin"),
             expand=kwargs.get("expand", 1.0),
         )
@@ -113,20 +1092,9 @@ class Colleciton(defaultdict):
         x_max, y_max = box[1]
         x_size = (x_max - x_min) / cols
         y_size = (y_max - y_min) / rows
-        tiles = Tiles()
-        for col in range(cols):
-            for row in range(rows):
-                x_start = x_min + col * x_size
-                y_start = y_min + row * y_size
-                x_end = x_start + x_size
-                y_end = y_start + y_size
-                colleciton = Colleciton()
-                for item in self.all_items():
-                    if x_start <= item.x < x_end and y_start <= item.y < y_end:
-                        colleciton.append(item)
-                tiles[(col, row)] = colleciton
-        return tiles
+        return self.__make_tiles((x_min, y_min), (x_size, y_size), (cols, rows))
 
+    @profiled("make_tiles_by_size", items=lambda tiles: len(tiles.source))
     def make_tiles_by_size(
         self,
         width: float,
@@ -139,22 +1107,219 @@ class Colleciton(defaultdict):
         x_max, y_max = box[1]
         cols = int((x_max - x_min) // width) + 1
         rows = int((y_max - y_min) // height) + 1
-        tiles = Tiles()
-        for col in range(cols):
-            for row in range(rows):
-                x_start = x_min + col * width
-                y_start = y_min + row * height
-                x_end = x_start + width
-                y_end = y_start + height
-                colleciton = Colleciton()
-                for item in self.all_items():
-                    if x_start <= item.x < x_end and y_start <= item.y < y_end:
-                        colleciton.append(item)
-                tiles[(col, row)] = colleciton
-        return tiles
-
-
-def from_file(file: Union[str, Path]) -> Colleciton:
+        return self.__make_tiles((x_min, y_min), (width, height), (cols, rows))
+
+    def __make_tiles(
+        self,
+        origin: Tuple[float, float],
+        size: Tuple[float, float],
+        shape: Tuple[int, int],
+    ) -> Tiles:
+        """Bin every item into a `shape` grid of `size` tiles starting at `origin`.
+
+        Each item's (col, row) is computed once by floor division, tiles are
+        half-open: `x_start <= x < x_start_of_next_tile`, so every item lands
+        in at most one tile.
+        """
+        if self.out_of_core:
+            return self.__stream_tiles(origin, size, shape)
+        inside, keys = _tile_keys(self.columns, origin, size, shape)
+        order = np.argsort(keys, kind="stable")
+        return Tiles(
+            self,
+            shape=shape,
+            origin=origin,
+            size=size,
+            source=inside[order],
+            tile=keys[order],
+        )
+
+    def __stream_tiles(
+        self,
+        origin: Tuple[float, float],
+        size: Tuple[float, float],
+        shape: Tuple[int, int],
+    ) -> Tiles:
+        """`__make_tiles` as a two-pass counting sort over the chunks.
+
+        The first pass reduces the per-net max and count of every tile, the
+        second scatters each chunk to its place in `source` and `tile`, which
+        are spilled to temporary files. Only the (nets, cols, rows) grids and
+        one chunk are held in memory.
+        """
+        nets = len(self.nets)
+        tiles = shape[0] * shape[1]
+        peaks = np.full(nets * tiles, -np.inf)
+        counts = np.zeros(nets * tiles, dtype=np.intp)
+        for _, chunk in self.__scan():
+            inside, keys = _tile_keys(chunk, origin, size, shape)
+            net_keys = chunk.net[inside].astype(np.intp) * tiles + keys
+            np.maximum.at(peaks, net_keys, chunk.value[inside])
+            counts += np.bincount(net_keys, minlength=nets * tiles)
+        peaks = peaks.reshape(nets, *shape)
+        counts = counts.reshape(nets, *shape)
+
+        # first free slot of every tile, items keep insertion order in a tile
+        tile_counts = counts.sum(axis=0).ravel()
+        cursor = np.zeros(tiles, dtype=np.intp)
+        np.cumsum(tile_counts[:-1], out=cursor[1:])
+        source = _spill(int(tile_counts.sum()), np.intp, self.spill_dir)
+        tile = _spill(len(source), np.intp, self.spill_dir)
+        for start, chunk in self.__scan():
+            inside, keys = _tile_keys(chunk, origin, size, shape)
+            order = np.argsort(keys, kind="stable")
+            inside, keys = inside[order] + start, keys[order]
+            rank = np.arange(len(keys)) - np.searchsorted(keys, keys)
+            at = cursor[keys] + rank
+            source[at] = inside
+            tile[at] = keys
+            cursor += np.bincount(keys, minlength=tiles)
+        return Tiles(
+            self,
+            shape=shape,
+            origin=origin,
+            size=size,
+            source=source,
+            tile=tile,
+            reduced=(peaks, counts),
+        )
+
+    @profiled("make_pyramid", items=lambda levels: len(levels[0].source))
+    def make_pyramid(
+        self,
+        cols: int,
+        rows: int,
+        finer: int = 0,
+        **kwargs,
+    ) -> List[Tiles]:
+        """Tiles of the same box at several resolutions, from `2 ** finer`
+        times finer than `cols` x `rows` down to a single tile. By default
+        the finest level is `cols` x `rows` itself, `levels[finer]` is always
+        that grid.
+
+        Only the finest level bins the items, every coarser level is max-pooled
+        from the one before it.
+        """
+        levels = [self.make_tiles(cols << finer, rows << finer, **kwargs)]
+        while levels[-1].shape != (1, 1):
+            levels.append(levels[-1].pool())
+        return levels
+
+
+def _pool(array: np.ndarray, shape: Tuple[int, int], ufunc, fill) -> np.ndarray:
+    """Reduce every 2x2 block of the last two axes of `array` into `shape`
+    with `ufunc`, odd sizes are padded with `fill`."""
+    lead = array.shape[:-2]
+    cols, rows = array.shape[-2:]
+    padded = np.full(lead + (shape[0] * 2, shape[1] * 2), fill, dtype=array.dtype)
+    padded[..., :cols, :rows] = array
+    blocks = padded.reshape(lead + (shape[0], 2, shape[1], 2))
+    return ufunc.reduce(ufunc.reduce(blocks, axis=-1), axis=-2)
+
+
+def _largest(values: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the `k` largest `values`, largest first, ties in order."""
+    k = min(max(k, 0), len(values))
+    if k == 0:
+        return np.zeros(0, dtype=np.intp)
+    if k < len(values):
+        part = np.argpartition(values, len(values) - k)[len(values) - k :]
+        part.sort()
+    else:
+        part = np.arange(len(values))
+    return part[np.argsort(-values[part], kind="stable")]
+
+
+def _sorted_quantile(values: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """q-quantile of every tile like `np.quantile`, from the values sorted by
+    tile and then by value, and the item count of every tile."""
+    starts = np.zeros(len(counts), dtype=np.intp)
+    np.cumsum(counts[:-1], out=starts[1:])
+    filled = np.flatnonzero(counts)
+    rank = (counts[filled] - 1) * q
+    below = np.floor(rank).astype(np.intp)
+    above = np.minimum(below + 1, counts[filled] - 1)
+    lower = values[starts[filled] + below]
+    upper = values[starts[filled] + above]
+    result = np.zeros(len(counts))
+    result[filled] = lower + (upper - lower) * (rank - below)
+    return result
+
+
+def _sketch_quantile(
+    hist: np.ndarray,
+    counts: np.ndarray,
+    q: float,
+    low: float,
+    width: float,
+) -> np.ndarray:
+    """Approximate q-quantile of every tile from its row of `hist`, counts of
+    value bins `width` wide starting at `low`.
+
+    The estimate lies in the bin of the item at rank `(count - 1) * q`, while
+    `np.quantile` interpolates between that item and the next one. The error
+    is therefore up to one bin plus the gap to the next item, which is only
+    small on tiles with many items.
+    """
+    cum = np.cumsum(hist, axis=1)
+    rank = (counts - 1) * q
+    index = np.minimum((cum <= rank[:, None]).sum(axis=1), hist.shape[1] - 1)
+    inside = hist[np.arange(len(hist)), index]
+    before = cum[np.arange(len(hist)), index] - inside
+    # spread the items of a bin evenly over its width
+    fraction = (rank - before + 0.5) / np.maximum(inside, 1)
+    return np.where(counts > 0, low + (index + np.clip(fraction, 0, 1)) * width, 0.0)
+
+
+def _tile_keys(
+    columns: Columns,
+    origin: Tuple[float, float],
+    size: Tuple[float, float],
+    shape: Tuple[int, int],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of the items inside a `shape` grid and their flat tile
+    index `col * rows + row`."""
+    cols, rows = shape
+    col_index = _bin_axis(columns.x, origin[0], size[0])
+    row_index = _bin_axis(columns.y, origin[1], size[1])
+    inside = np.flatnonzero(
+        (col_index >= 0) & (col_index < cols) & (row_index >= 0) & (row_index < rows)
+    )
+    keys = (col_index[inside] * rows + row_index[inside]).astype(np.intp)
+    return inside, keys
+
+
+def _spill(count: int, dtype, directory: Optional[Path] = None) -> np.ndarray:
+    """Zeroed array of `count` items backed by an unlinked temporary file in
+    `directory`, the file goes away with the array."""
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    with tempfile.TemporaryFile(dir=directory) as f:
+        return np.memmap(f, dtype=dtype, mode="w+", shape=(count,)).view(np.ndarray)
+
+
+def _bin_axis(values: np.ndarray, start: float, size: float) -> np.ndarray:
+    """Tile index of each value along one axis, NaN if it cannot be binned."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        index = np.floor((values - start) / size)
+        # floor division may round across an edge, fix it up against the
+        # exact `start + index * size` tile boundaries
+        index -= values < start + index * size
+        index += values >= start + (index + 1) * size
+    return index
+
+
+@profiled("from_file", items=lambda collection: collection.size)
+def from_file(
+    file: Union[str, Path],
+    progress: Optional[Callable[[int, int], None]] = None,
+    chunk_size: int = _reader.CHUNK_SIZE,
+    cache: bool = True,
+    rebuild_cache: bool = False,
+    workers: int = 1,
+    out_of_core: bool = False,
+    spill_dir: Optional[Union[str, Path]] = None,
+) -> Colleciton:
     """file format:
     ```
     #net  value  x      y      path
@@ -165,20 +1330,275 @@ def from_file(file: Union[str, Path]) -> Colleciton:
     VCCD  28.10  84.42  38.62  X24/X34/X30/X38
     VSSD  14.63  25.73  15.37  X3/X4
     ```
+
+    The file is read and parsed `chunk_size` bytes at a time, it may be
+    gzip/bz2/xz compressed, `-` reads stdin. `progress(done, total)` is
+    called after every chunk with the bytes consumed so far, `total` is 0
+    when the size is unknown.
+
+    With `cache` the parsed columns are also written to a binary sidecar
+    next to the file (`ir.list.irhm`), later calls memory-map it instead of
+    parsing as long as the file is unchanged. `rebuild_cache` ignores an
+    existing sidecar and writes a fresh one.
+
+    `workers` > 1 parses an uncompressed file in that many processes, the
+    result is the same as a serial parse.
+
+    `out_of_core` returns an out-of-core collection over the memory-mapped
+    sidecar, see `Colleciton`. A missing or stale sidecar is written by a
+    serial parse that streams every chunk straight to disk, so the items
+    never have to fit in memory. It needs `cache` and a file, not stdin.
+    Temporary files of the collection go to `spill_dir`, by default next to
+    the sidecar, since the system temporary directory is often a tmpfs held
+    in memory.
     """
-    collection = Colleciton()
-    for line in Path(file).read_text().splitlines():
-        tokens = line.partition("#")[0].split()
-        if not tokens:
-            continue
-        net, value, x, y, path = tokens
-        collection.append(
-            Item(
-                net=net,
-                value=float(value),
-                x=float(x),
-                y=float(y),
-                path=path,
-            )
+    if out_of_core:
+        if not cache or str(file) == "-":
+            raise ValueError("out-of-core mode needs the cache of an input file")
+        spill_dir = Path(
+            _cache.sidecar(file).parent if spill_dir is None else spill_dir
         )
+        collection = None if rebuild_cache else _load_cache(file, spill_dir)
+        if collection is None:
+            _stream_cache(file, chunk_size, progress)
+            collection = _load_cache(file, spill_dir)
+        elif progress is not None:
+            size = Path(file).stat().st_size
+            progress(size, size)
+        if collection is None:
+            raise OSError(f"cannot read {_cache.sidecar(file)}")
+        return collection
+
+    cache = cache and str(file) != "-"
+    if cache and not rebuild_cache:
+        collection = _load_cache(file)
+        if collection is not None:
+            if progress is not None:
+                size = Path(file).stat().st_size
+                progress(size, size)
+            return collection
+
+    # fingerprint before parsing, lines appended meanwhile make the cache stale
+    key = _cache.fingerprint(file) if cache else None
+    if workers > 1 and _reader.splittable(file):
+        try:
+            collection = _parse_parallel(file, workers, chunk_size, progress)
+        except ValueError:
+            # parse again serially to report the right line number
+            collection = _parse(file, chunk_size, progress)
+    else:
+        collection = _parse(file, chunk_size, progress)
+    if cache:
+        _save_cache(file, collection, key)
     return collection
+
+
+def read_appended(
+    file: Union[str, Path],
+    offset: int = 0,
+    chunk_size: int = _reader.CHUNK_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[List[_reader.Block], _reader.Snapshot]:
+    """Parse the whole lines a plain, growing `file` has after `offset`.
+
+    A last line still missing its newline is left for the next call. Returns
+    the blocks, to be added with `merge_blocks`, and a `Snapshot` of the
+    file whose `offset` is where to continue from.
+    """
+    stat = os.stat(file)
+    end = _reader.line_end(file, offset)
+    blocks = _reader.parse_range(file, offset, end, chunk_size, progress)
+    return blocks, _reader.Snapshot.take(file, end, stat)
+
+
+def merge_blocks(
+    collection: Colleciton,
+    blocks: Sequence[_reader.Block],
+) -> np.ndarray:
+    """Append parsed blocks to `collection`, returns the new item indexes."""
+    start = collection.size
+    for block in blocks:
+        _extend(collection, block)
+    return np.arange(start, collection.size)
+
+
+def _parse(
+    file: Union[str, Path],
+    chunk_size: int,
+    progress: Optional[Callable[[int, int], None]],
+) -> Colleciton:
+    collection = Colleciton()
+    with _reader.Source(file) as source:
+        for data, line in source.chunks(chunk_size):
+            _extend(collection, _reader.parse(data, line))
+            if progress is not None:
+                progress(source.position, source.total)
+    return collection
+
+
+def _parse_parallel(
+    file: Union[str, Path],
+    workers: int,
+    chunk_size: int,
+    progress: Optional[Callable[[int, int], None]],
+) -> Colleciton:
+    """Parse byte ranges of a plain file in a process pool, then merge the
+    blocks in file order so the result matches `_parse`."""
+    ranges = _reader.split(file, workers * 4)
+    total = ranges[-1][1] if ranges else 0
+    done = 0
+    collection = Colleciton()
+    with _process_pool(workers) as executor:
+        futures = [
+            executor.submit(_reader.parse_range, file, start, end, chunk_size)
+            for start, end in ranges
+        ]
+        try:
+            for future, (start, end) in zip(futures, ranges):
+                for block in future.result():
+                    _extend(collection, block)
+                done += end - start
+                if progress is not None:
+                    progress(done, total)
+        except BaseException:
+            # `progress` may raise to abort, skip the ranges not started yet
+            for future in futures:
+                future.cancel()
+            raise
+    return collection
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool of `workers` processes that are never forked from this one.
+
+    Parsing and rendering may run on a thread of the window's pool, and
+    forking a process with other threads running, Qt's among them, can
+    deadlock the child on a lock one of them held. The workers are forked
+    from a fresh server process instead, or spawned where that is missing.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    method = "forkserver" if "forkserver" in methods else "spawn"
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context(method)
+    )
+
+
+# column dtypes of the sidecar, in file order. Every item has its own path,
+# so the path ids are not stored but made again by `_load_cache`
+_CACHE_DTYPES = {
+    "net": "int32",
+    "value": "float64",
+    "x": "float64",
+    "y": "float64",
+    "path_data": "uint8",
+    "path_offsets": "int64",
+}
+
+
+def _save_cache(file: Union[str, Path], collection: Colleciton, key: dict) -> None:
+    columns = collection.columns
+    _cache.save(
+        file,
+        {"nets": collection.nets, "stats": collection.stats.to_meta()},
+        {
+            "net": columns.net,
+            "value": columns.value,
+            "x": columns.x,
+            "y": columns.y,
+            "path_data": collection.paths.data,
+            "path_offsets": collection.paths.offsets,
+        },
+        key,
+    )
+
+
+def _stream_cache(
+    file: Union[str, Path],
+    chunk_size: int,
+    progress: Optional[Callable[[int, int], None]],
+) -> None:
+    """Parse `file` straight into its sidecar, one chunk at a time."""
+    nets = Colleciton()
+    stats = Stats()
+    paths = end = 0
+    with _cache.Writer(file, _CACHE_DTYPES) as writer:
+        writer.append("path_offsets", np.zeros(1))
+        with _reader.Source(file) as source:
+            for data, line in source.chunks(chunk_size):
+                block = _reader.parse(data, line)
+                codes = np.array([nets.code(net) for net in block.nets], np.int32)
+                columns = Columns(
+                    net=codes[block.net],
+                    value=block.value,
+                    x=block.x,
+                    y=block.y,
+                    path=np.arange(paths, paths + len(block.lengths)),
+                )
+                stats.update(columns)
+                for name in "net", "value", "x", "y":
+                    writer.append(name, getattr(columns, name))
+                writer.append("path_data", np.frombuffer(block.paths, np.uint8))
+                writer.append("path_offsets", end + np.cumsum(block.lengths))
+                paths += len(block.lengths)
+                end += int(np.sum(block.lengths))
+                if progress is not None:
+                    progress(source.position, source.total)
+        stats.resize(len(nets.nets))
+        if not _cache.unchanged(file, writer.key):
+            raise OSError(f"{file} changed while it was read")
+        if not writer.commit({"nets": nets.nets, "stats": stats.to_meta()}):
+            raise OSError(f"cannot write {writer.path}")
+
+
+def _load_cache(
+    file: Union[str, Path], spill_dir: Optional[Path] = None
+) -> Optional[Colleciton]:
+    """Collection over the memory-mapped sidecar of `file`, out of core and
+    spilling to `spill_dir` if that is given."""
+    cached = _cache.load(file)
+    if cached is None:
+        return None
+    meta, arrays = cached
+    collection = Colleciton(
+        nets=meta["nets"],
+        paths=Paths(arrays["path_data"], arrays["path_offsets"]),
+        out_of_core=spill_dir is not None,
+        spill_dir=spill_dir,
+    )
+    collection.extend(
+        Columns(
+            net=arrays["net"],
+            value=arrays["value"],
+            x=arrays["x"],
+            y=arrays["y"],
+            path=_path_ids(len(arrays["net"]), spill_dir),
+        ),
+        stats=Stats.from_meta(meta["stats"]),
+    )
+    return collection
+
+
+def _path_ids(count: int, spill_dir: Optional[Path] = None) -> np.ndarray:
+    """The path ids 0 to `count` of a parsed file, spilled to `spill_dir` if
+    that is given."""
+    if spill_dir is None:
+        return np.arange(count, dtype=np.int64)
+    ids = _spill(count, np.int64, spill_dir)
+    for start in range(0, count, STREAM_ROWS):
+        ids[start : start + STREAM_ROWS] = np.arange(
+            start, min(start + STREAM_ROWS, count)
+        )
+    return ids
+
+
+def _extend(collection: Colleciton, block: _reader.Block) -> None:
+    codes = np.array([collection.code(net) for net in block.nets], dtype=np.int32)
+    collection.extend(
+        Columns(
+            net=codes[block.net],
+            value=block.value,
+            x=block.x,
+            y=block.y,
+            path=collection.paths.extend(block.paths, block.lengths),
+        )
+    )
@@ -0,0 +1,312 @@
+import csv
+import json
+import math
+import re
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from matplotlib.image import AxesImage
+from matplotlib.text import Text
+from matplotlib.ticker import FuncFormatter, IndexLocator
+
+from ._profile import current, profiled
+from .ir import METRICS, Colleciton, Tiles, _process_pool
+
+# tiles are annotated with their value up to this many of them, also in the
+# window, where only the visible ones count
+ANNOTATE_CELLS = 400
+FORMATS = ("png", "svg")
+TABLES = ("csv", "json")
+# a supply net and a ground net with the same suffix form a domain,
+# e.g. VCCA and VSSA
+SUPPLY_PREFIXES = ("VCC", "VDD")
+GROUND_PREFIXES = ("VSS", "GND")
+
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def parse_pairs(text: str) -> List[Tuple[str, str]]:
+    """`VCC:VSS,VCCA:VSSA` -> [("VCC", "VSS"), ("VCCA", "VSSA")]"""
+    pairs = []
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        net1, sep, net2 = part.partition(":")
+        if not sep or not net1.strip() or not net2.strip():
+            raise ValueError(f"invalid net pair {part!r}, expected NET1:NET2")
+        pairs.append((net1.strip(), net2.strip()))
+    return pairs
+
+
+def domain_pairs(nets: Sequence[str]) -> List[Tuple[str, str]]:
+    """Supply/ground pairs among `nets` matched by name, in supply order:
+    `["VCC", "VSS", "VCCA", "VSSA"]` -> [("VCC", "VSS"), ("VCCA", "VSSA")]"""
+    grounds = {}
+    for net in nets:
+        for prefix in GROUND_PREFIXES:
+            if net.upper().startswith(prefix):
+                grounds.setdefault(net[len(prefix) :].upper(), net)
+                break
+    pairs = []
+    for net in nets:
+        for prefix in SUPPLY_PREFIXES:
+            if net.upper().startswith(prefix):
+                ground = grounds.get(net[len(prefix) :].upper())
+                if ground is not None:
+                    pairs.append((net, ground))
+                break
+    return pairs
+
+
+@profiled("render")
+def render(
+    collection: Colleciton,
+    pairs: Sequence[Tuple[str, str]],
+    array: Tuple[int, int],
+    out: Union[str, Path],
+    formats: Sequence[str] = ("png",),
+    tables: Sequence[str] = TABLES,
+    jobs: int = 1,
+    metric: str = "max",
+    dashboard: bool = False,
+) -> List[Path]:
+    """Write a heatmap image and drop tables for every net pair into `out`.
+
+    The collection is tiled once, the drop arrays of all pairs come from the
+    same `Tiles`, as the sum of `metric` of both nets. Images are drawn with
+    the Agg backend, in `jobs` processes when `jobs` > 1. With `dashboard`
+    all pairs are also drawn side by side on one color scale into
+    `dashboard.<format>`. Returns the written files.
+    """
+    for net1, net2 in pairs:
+        for net in net1, net2:
+            if net not in collection:
+                raise ValueError(f"net {net!r} not found")
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric {metric!r}")
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"unsupported image format {fmt!r}")
+    for fmt in tables:
+        if fmt not in TABLES:
+            raise ValueError(f"unsupported table format {fmt!r}")
+
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    tiles = collection.make_tiles(*array)
+    current().items = collection.size
+    jobs_args = []
+    written = []
+    for net1, net2 in pairs:
+        stem = str(out / _UNSAFE.sub("_", f"{net1}_{net2}"))
+        drop = np.array(tiles.drop(net1, net2, metric))
+        cell_drop = collection.calc_drop(net1, net2)
+        title = f"{net1} - {net2} - max {cell_drop:.2f}"
+        jobs_args.append((stem, drop, title, formats))
+        if "csv" in tables:
+            written.append(_write_csv(Path(f"{stem}.csv"), drop))
+        if "json" in tables:
+            written.append(
+                _write_json(
+                    Path(f"{stem}.json"),
+                    tiles,
+                    drop,
+                    {"net1": net1, "net2": net2, "drop": cell_drop, "metric": metric},
+                )
+            )
+
+    if dashboard and pairs:
+        written.extend(
+            _draw_dashboard(
+                str(out / "dashboard"),
+                [args[1] for args in jobs_args],
+                [args[2] for args in jobs_args],
+                metric,
+                formats,
+            )
+        )
+    if jobs > 1 and len(jobs_args) > 1:
+        with _process_pool(jobs) as executor:
+            for paths in executor.map(_draw, *zip(*jobs_args)):
+                written.extend(paths)
+    else:
+        for args in jobs_args:
+            written.extend(_draw(*args))
+    return written
+
+
+def draw_heatmap(figure: Figure, drop: np.ndarray, title: str) -> None:
+    """Draw a (cols, rows) drop array on `figure` like the heatmap window."""
+    axes = figure.add_subplot(111)
+    cols, rows = drop.shape
+    image = axes.imshow(
+        drop.T,
+        cmap="coolwarm",
+        origin="lower",
+        extent=(0, cols, 0, rows),
+        aspect="auto",
+        interpolation="nearest",
+    )
+    figure.colorbar(image, ax=axes)
+    axes.set_title(title)
+    axes.set_xlabel("Columns")
+    axes.set_ylabel("Rows")
+    # ticks at the tile centers, thinned out on large grids
+    formatter = FuncFormatter(lambda value, _: f"{int(value)}")
+    axes.xaxis.set_major_locator(IndexLocator(max(cols // 20, 1), 0.5))
+    axes.yaxis.set_major_locator(IndexLocator(max(rows // 20, 1), 0.5))
+    axes.xaxis.set_major_formatter(formatter)
+    axes.yaxis.set_major_formatter(formatter)
+    annotate(axes, image, drop, range(cols), range(rows))
+
+
+def annotate(
+    axes: Axes, image: AxesImage, drop: np.ndarray, cols: range, rows: range
+) -> List[Text]:
+    """Write the value of the tiles `cols` x `rows` of `drop` on them, in
+    white where `image` colors them far from its middle. Writes nothing if
+    that is more than `ANNOTATE_CELLS` tiles, returns the texts."""
+    if len(cols) * len(rows) > ANNOTATE_CELLS:
+        return []
+    vmin, vmax = image.get_clim()
+    mid_value = (vmax + vmin) / 2
+    qtr_value = (vmax - vmin) / 4
+    texts = []
+    for col in cols:
+        for row in rows:
+            value = drop[col, row]
+            texts.append(
+                axes.text(
+                    col + 0.5,
+                    row + 0.5,
+                    f"{value:.2f}",
+                    ha="center",
+                    va="center",
+                    color="#FFFFFF"
+                    if abs(value - mid_value) > qtr_value
+                    else "#000000",
+                    fontsize=10,
+                )
+            )
+    return texts
+
+
+def draw_dashboard(
+    figure: Figure,
+    drops: Sequence[np.ndarray],
+    titles: Sequence[str],
+    label: str = "",
+    symmetric: bool = False,
+) -> List[Axes]:
+    """Draw (cols, rows) drop arrays as small multiples on `figure`.
+
+    All heatmaps share one `Normalize` and one colorbar so their colors
+    compare directly, `symmetric` centers the scale on 0 for differences.
+    Returns the axes, one per drop array.
+    """
+    count = len(drops)
+    grid_cols = math.ceil(math.sqrt(count))
+    grid_rows = math.ceil(count / grid_cols)
+    grid = figure.subplots(grid_rows, grid_cols, squeeze=False).ravel()
+    for axes in grid[count:]:
+        axes.remove()
+    vmin = min((float(drop.min()) for drop in drops if drop.size), default=0.0)
+    vmax = max((float(drop.max()) for drop in drops if drop.size), default=0.0)
+    if symmetric:
+        vmax = max(abs(vmin), abs(vmax))
+        vmin = -vmax
+    norm = Normalize(vmin, vmax)
+    formatter = FuncFormatter(lambda value, _: f"{int(value)}")
+    image = None
+    for axes, drop, title in zip(grid, drops, titles):
+        cols, rows = drop.shape
+        image = axes.imshow(
+            drop.T,
+            cmap="coolwarm",
+            norm=norm,
+            origin="lower",
+            extent=(0, cols, 0, rows),
+            aspect="auto",
+            interpolation="nearest",
+        )
+        axes.set_title(title, fontsize=10)
+        axes.xaxis.set_major_locator(IndexLocator(max(cols // 5, 1), 0.5))
+        axes.yaxis.set_major_locator(IndexLocator(max(rows // 5, 1), 0.5))
+        axes.xaxis.set_major_formatter(formatter)
+        axes.yaxis.set_major_formatter(formatter)
+    if image is not None:
+        figure.colorbar(image, ax=list(grid[:count]), label=label)
+    return list(grid[:count])
+
+
+@profiled("draw_heatmap")
+def _draw(
+    stem: str,
+    drop: np.ndarray,
+    title: str,
+    formats: Sequence[str],
+) -> List[Path]:
+    figure = Figure(facecolor="#DFDFDF")
+    FigureCanvasAgg(figure)
+    draw_heatmap(figure, drop, title)
+    current().items = drop.size
+    paths = []
+    for fmt in formats:
+        path = Path(f"{stem}.{fmt}")
+        figure.savefig(path, format=fmt)
+        paths.append(path)
+    return paths
+
+
+@profiled("draw_dashboard")
+def _draw_dashboard(
+    stem: str,
+    drops: Sequence[np.ndarray],
+    titles: Sequence[str],
+    label: str,
+    formats: Sequence[str],
+) -> List[Path]:
+    grid_cols = math.ceil(math.sqrt(len(drops)))
+    grid_rows = math.ceil(len(drops) / grid_cols)
+    figure = Figure(figsize=(4 * grid_cols + 1, 3.5 * grid_rows), facecolor="#DFDFDF")
+    FigureCanvasAgg(figure)
+    draw_dashboard(figure, drops, titles, label)
+    current().items = sum(drop.size for drop in drops)
+    paths = []
+    for fmt in formats:
+        path = Path(f"{stem}.{fmt}")
+        figure.savefig(path, format=fmt)
+        paths.append(path)
+    return paths
+
+
+def _write_csv(path: Path, drop: np.ndarray) -> Path:
+    """Tiles sorted by drop, worst first."""
+    flat = drop.ravel()
+    order = np.argsort(-flat, kind="stable")
+    cols, rows = np.unravel_index(order, drop.shape)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["col", "row", "value"])
+        writer.writerows(zip(cols.tolist(), rows.tolist(), flat[order].tolist()))
+    return path
+
+
+def _write_json(path: Path, tiles: Tiles, drop: np.ndarray, info: Dict) -> Path:
+    data = dict(
+        info,
+        shape=list(tiles.shape),
+        origin=list(tiles.origin),
+        size=list(tiles.size),
+        max=float(drop.max()),
+        min=float(drop.min()),
+        tiles=drop.tolist(),
+    )
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    return path
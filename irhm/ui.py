@@ -1,29 +1,69 @@
-from typing import Optional, Sequence, Tuple, Callable
+import os
 from pathlib import Path
-from matplotlib.backend_bases import MouseEvent
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from matplotlib.backend_bases import MouseButton, MouseEvent
+from matplotlib.collections import LineCollection
 from matplotlib.figure import Figure
 from matplotlib.patches import Rectangle
-import seaborn
+from matplotlib.ticker import FuncFormatter, IndexLocator
 
+from . import diff, release
+from ._profile import current, profiled
 from ._qt import (
+    FigureCanvasQTAgg,
+    QAbstractTableModel,
     QApplication,
-    QMainWindow,
-    QWidget,
-    QVBoxLayout,
-    QTableWidget,
-    QTableWidgetItem,
-    QHeaderView,
-    QSplitter,
-    QLabel,
     QComboBox,
     QHBoxLayout,
-    QSizePolicy,
+    QHeaderView,
     QIcon,
+    QLabel,
+    QMainWindow,
+    QMessageBox,
+    QModelIndex,
+    QProgressBar,
+    QPushButton,
+    QSizePolicy,
+    QSpinBox,
+    QSplitter,
     Qt,
-    FigureCanvasQTAgg,
+    QTableView,
+    QTabWidget,
+    QThreadPool,
+    QTimer,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
 )
-from .ir import Colleciton, Tiles
-from . import release
+from ._reader import Snapshot, line_end
+from ._worker import Progress, Task, TaskSignals
+from .ir import (
+    METRICS,
+    ArrayInfo,
+    Colleciton,
+    Items,
+    Tiles,
+    from_file,
+    merge_blocks,
+    read_appended,
+)
+from .render import annotate, domain_pairs, draw_dashboard
+
+# 右键查询时每个网络显示的最近实例数
+NEAREST_K = 100
+# 表格默认只显示最差的前 TOP_K 行，0 表示全部显示
+TOP_K = 500
+# 行列数都不超过该数量时才绘制网格线
+GRID_LINES = 100
+# 鼠标悬停的处理间隔（毫秒），约一帧
+HOVER_INTERVAL = 16
+# 监视模式下检查文件的间隔（毫秒）
+WATCH_INTERVAL = 1000
+# 后台任务仍在读取数据时，推迟合并新追加内容的重试间隔（毫秒）
+MERGE_INTERVAL = 50
 
 
 class HeatmapApp(QApplication):
@@ -32,6 +72,7 @@ class HeatmapApp(QApplication):
         *args,
         collection: Colleciton = None,
         array: Tuple[int, int] = (10, 10),
+        finer: int = 0,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
@@ -39,7 +80,9 @@ class HeatmapApp(QApplication):
         self.window = HeatmapWindow()
         self.window.collection = collection
         self.window.array = array
-        self.window.init()
+        self.window.finer = finer
+        if collection is not None:
+            self.window.init()
 
     def show(self):
         self.window.show()
@@ -50,11 +93,33 @@ class HeatmapWindow(QMainWindow):
         self,
         collection: Optional[Colleciton] = None,
         array: Tuple[int, int] = (10, 10),
+        finer: int = 0,
     ) -> None:
         super().__init__()
         self.collection = collection
+        # 对比模式下的参考结果，热力图显示 `collection` 相对它的变化
+        self.baseline: Optional[Colleciton] = None
         self.array = array
+        # 金字塔最细一级比 `array` 细 2 ** finer 倍，默认就是 `array`
+        self.finer = finer
         self.inited: bool = False
+        self.__picked: Optional[Tuple[int, int]] = None
+        # 层次结构每个节点的压降和实例数
+        self.__blocks: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # 被监视的文件和它已解析部分的快照
+        self.__watched: Optional[Tuple[Union[str, Path], Snapshot]] = None
+        # 已解析、等待合并的新追加内容
+        self.__appended: list = []
+        # 小多图中的网络对和对应的子图，过期时在页面可见后重新计算
+        self.__dashboard_pairs: List[Tuple[str, str]] = []
+        self.__dashboard_axes: list = []
+        self.__dashboard_stale = True
+        self.__tasks: Dict[str, Task] = {}
+        self.pool = QThreadPool(self)
+        self.__signals = TaskSignals(self)
+        self.__signals.progress.connect(self.__task_progress_cb)
+        self.__signals.finished.connect(self.__task_finished_cb)
+        self.__signals.failed.connect(self.__task_failed_cb)
         self.__ui()
 
     @property
@@ -82,142 +147,700 @@ class HeatmapWindow(QMainWindow):
     def tiles(self) -> Tiles:
         return self.__tiles
 
-    def update_tiles(self, col: int, row: int):
-        self.__tiles = self.collection.make_tiles(col, row)
+    @property
+    def levels(self) -> List[Tiles]:
+        return self.__levels
+
+    @property
+    def level_shapes(self) -> List[Tuple[int, int]]:
+        return [tiles.shape for tiles in self.levels]
+
+    def __set_levels(self, levels: List[Tiles]) -> None:
+        self.__levels = levels
+        self.__tiles = self.levels[self.finer]
+
+    def load(self, file: Union[str, Path], watch: bool = False, **kwargs) -> None:
+        """在后台读取文件，读完后初始化，`kwargs` 传给 `from_file`
+
+        `watch` 时不使用缓存，之后定时检查文件，只解析新追加的行并原地更新
+        """
+        self.__reset()
+
+        def work(report: Progress) -> Colleciton:
+            return from_file(file, progress=report, **kwargs)
+
+        def work_watch(report: Progress) -> Tuple[Colleciton, Snapshot]:
+            blocks, snapshot = read_appended(file, progress=report)
+            collection = Colleciton()
+            merge_blocks(collection, blocks)
+            return collection, snapshot
+
+        def done_watch(result: Tuple[Colleciton, Snapshot]) -> None:
+            self.__watched = (file, result[1])
+            self.__watch_timer.start()
+            self.__load_done(result[0])
+
+        if watch:
+            self.__submit("load", work_watch, done_watch, f"Loading {file}")
+        else:
+            self.__submit("load", work, self.__load_done, f"Loading {file}")
+
+    def load_diff(
+        self, before: Union[str, Path], after: Union[str, Path], **kwargs
+    ) -> None:
+        """在后台同时读取两个文件，热力图显示 `after` 相对 `before` 的变化"""
+        self.__reset()
+
+        def work(report: Progress) -> Tuple[Colleciton, Colleciton]:
+            return diff.load_pair(before, after, progress=report, **kwargs)
+
+        def done(result: Tuple[Colleciton, Colleciton]) -> None:
+            self.baseline = result[0]
+            self.__load_done(result[1])
+
+        self.__submit("load", work, done, f"Loading {before} and {after}")
+
+    def __reset(self) -> None:
+        """读取新文件前清空结果，取消属于旧数据的后台任务并停止监视"""
+        self.__cancel()
+        self.collection = None
+        self.baseline = None
+        self.clear_all()
+        self.clear_dashboard()
+        self.__watch_timer.stop()
+        self.__watched = None
+        self.__appended = []
+
+    def __load_done(self, collection: Colleciton) -> None:
+        self.collection = collection
+        self.init()
+
+    def __watch_timeout_cb(self) -> None:
+        """定时检查被监视的文件，追加了完整的行时在后台解析
+
+        inode、修改时间和大小都没变时不做任何事；文件被替换、截断或重写
+        （已解析部分末尾的内容变了）时重新读取整个文件
+        """
+        if self.__watched is None or self.__tasks or self.__appended:
+            return
+        file, snapshot = self.__watched
+        try:
+            stat = os.stat(file)
+            if snapshot.same(stat):
+                return
+            appended = snapshot.appended(file, stat)
+            end = line_end(file, snapshot.offset) if appended else snapshot.offset
+        except OSError:
+            return
+        if not appended:
+            self.load(file, watch=True)
+        elif end == snapshot.offset:
+            # 最后一行还没写完，等它写完再解析
+            self.__watched = (file, snapshot.grown(stat))
+        else:
+
+            def work(report: Progress) -> Tuple[list, Snapshot]:
+                return read_appended(file, snapshot.offset)
+
+            self.__submit("watch", work, self.__watch_done, f"Reading {file}")
+
+    def __watch_done(self, result: Tuple[list, Snapshot]) -> None:
+        blocks, snapshot = result
+        self.__watched = (self.__watched[0], snapshot)
+        self.__appended.extend(blocks)
+        self.__merge_appended()
+
+    def __merge_appended(self) -> None:
+        """合并新解析的行，新点都在原网格内时只更新受影响的格子
+
+        合并会原地修改集合和分块，线程池中仍有任务（包括已取消但尚未退出的）
+        时推迟到它们结束之后
+        """
+        if not self.__appended:
+            return
+        if self.__tasks or self.pool.activeThreadCount():
+            QTimer.singleShot(MERGE_INTERVAL, self.__merge_appended)
+            return
+        blocks, self.__appended = self.__appended, []
+        index = merge_blocks(self.collection, blocks)
+        if len(index) == 0 or not self.inited:
+            return
+        if not self.levels[0].update(index):
+            # 新点超出了原来的范围，按同样的行列数重新分箱
+            self.array = self.levels[self.finer].shape
+            self.init()
+            return
+        for level in self.levels[1:]:
+            level.repool()
+        nets = list(self.collection.keys())
+        for sel in self.net_selector1, self.net_selector2:
+            known = {sel.itemText(i) for i in range(sel.count())}
+            sel.addItems([net for net in nets if net not in known])
+        self.__invalidate_dashboard()
+        self.__refresh_pair()
 
     def init(self) -> None:
+        """在后台分箱，完成后填充选择框"""
         if self.collection is None:
             raise ValueError("Collection undefined")
-        self.update_tiles(*self.array)
-        nets = [""] + list(self.collection.keys())
         self.inited = False
-        for sel in self.net_selector1, self.net_selector2:
+        collection, (col, row) = self.collection, self.array
+        baseline, finer = self.baseline, self.finer
+
+        def work(report: Progress) -> List[Tiles]:
+            if baseline is not None:
+                # 两次结果分到同一组网格上
+                return diff.make_pyramid(baseline, collection, col, row, finer=finer)
+            return collection.make_pyramid(col, row, finer=finer)
+
+        self.__submit("tiles", work, self.__init_done, "Tiling")
+
+    def __init_done(self, levels: List[Tiles]) -> None:
+        """填充选择框，尽量保留之前选中的分辨率和网络"""
+        level = self.array_selector.currentText()
+        selected = [self.net_selector1.currentText(), self.net_selector2.currentText()]
+        self.__set_levels(levels)
+        nets = [""] + list(self.collection.keys())
+        shapes = [f"{c}x{r}" for c, r in self.level_shapes]
+        self.array_selector.clear()
+        self.array_selector.addItems(shapes)
+        index = shapes.index(level) if level in shapes else self.finer
+        self.array_selector.setCurrentIndex(index)
+        self.__tiles = self.levels[index]
+        for sel, net in zip([self.net_selector1, self.net_selector2], selected):
             sel.clear()
             sel.addItems(nets)
-            sel.setCurrentIndex(0)
+            sel.setCurrentIndex(nets.index(net) if net in nets else 0)
         self.inited = True
+        self.left_tabs.setTabEnabled(
+            self.left_tabs.indexOf(self.hierarchy_tree),
+            not self.collection.out_of_core,
+        )
+        self.__invalidate_dashboard()
+        if any(selected):
+            self.__net_selector_cb()
+
+    def __array_selector_cb(self, index: int) -> None:
+        """切换分辨率时回调，直接使用预先池化好的层级"""
+        if not self.inited or not 0 <= index < len(self.levels):
+            return
+        self.__tiles = self.levels[index]
+        self.array = self.tiles.shape
+        self.__invalidate_dashboard()
+        self.__net_selector_cb()
+
+    def __metric_selector_cb(self) -> None:
+        """切换统计量时回调，小多图也使用该统计量"""
+        if not self.inited:
+            return
+        self.__invalidate_dashboard()
+        self.__net_selector_cb()
 
     def __net_selector_cb(self) -> None:
         """切换网络时回调"""
         if not self.inited:
             return
+        self.clear_all()
+        self.__refresh_pair()
+
+    def __refresh_pair(self) -> None:
+        """后台计算当前网络对的压降，完成后原地刷新热力图和表格"""
         net1 = self.net_selector1.currentText()
         net2 = self.net_selector2.currentText()
-        self.clear_all()
+        self.__cancel("drop")
+        self.__cancel("blocks")
         if net1 == "" or net2 == "":
             pass
         elif net1 == net2:
             pass
         else:
-            self.__refresh_heatmap(net1, net2)
-            self.__refresh_heatmap_table(net1, net2)
+            collection, tiles, metric = (
+                self.collection,
+                self.tiles,
+                self.selected_metric,
+            )
+            baseline = self.baseline
+
+            def work(report: Progress) -> Tuple[ArrayInfo, float]:
+                cell_drop = collection.calc_drop(net1, net2)
+                if baseline is not None:
+                    cell_drop -= baseline.calc_drop(net1, net2)
+                return tiles.array_info(net1, net2, metric), cell_drop
+
+            def done(result: Tuple[ArrayInfo, float]) -> None:
+                self.__refresh_heatmap(net1, net2, *result, metric)
+                self.__refresh_heatmap_table(net1, net2)
+                if self.__picked is not None:
+                    self.__refresh_net_table(*self.__picked)
+
+            self.__submit("drop", work, done, f"Computing {net1} - {net2}")
+            if collection.out_of_core:
+                # 核外模式不建层次结构
+                return
+
+            def work_blocks(report: Progress) -> Tuple[np.ndarray, np.ndarray]:
+                return (
+                    collection.block_drop(net1, net2),
+                    collection.block_count(net1, net2),
+                )
+
+            self.__submit(
+                "blocks", work_blocks, self.__refresh_hierarchy, "Indexing paths"
+            )
+
+    def __submit(
+        self,
+        kind: str,
+        func: Callable[[Progress], Any],
+        callback: Callable[[Any], None],
+        message: str,
+    ) -> None:
+        """在线程池中运行任务，同类的旧任务被取消，其结果也会被丢弃"""
+        self.__cancel(kind)
+        task = Task(func, self.__signals, callback)
+        self.__tasks[kind] = task
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setFormat(message)
+        self.progress_bar.show()
+        self.cancel_button.show()
+        self.pool.start(task)
+
+    def __cancel(self, kind: Optional[str] = None) -> None:
+        """取消任务，`kind` 为 None 时取消全部"""
+        for key in [kind] if kind is not None else list(self.__tasks):
+            if key in self.__tasks:
+                self.__tasks.pop(key).cancel()
+        self.__update_progress()
+
+    def __current(self, task: Task) -> bool:
+        """任务是否仍是同类中最新的"""
+        return task in self.__tasks.values()
+
+    def __task_progress_cb(self, task: Task, done: int, total: int) -> None:
+        if not self.__current(task):
+            return
+        if total:
+            self.progress_bar.setRange(0, 1000)
+            self.progress_bar.setValue(int(min(done / total, 1.0) * 1000))
+        else:
+            self.progress_bar.setRange(0, 0)
+
+    def __task_finished_cb(self, task: Task) -> None:
+        if not self.__current(task):
+            return
+        self.__tasks = {k: t for k, t in self.__tasks.items() if t is not task}
+        self.__update_progress()
+        task.callback(task.result)
+
+    def __task_failed_cb(self, task: Task, message: str) -> None:
+        if not self.__current(task):
+            return
+        self.__tasks = {k: t for k, t in self.__tasks.items() if t is not task}
+        self.__update_progress()
+        QMessageBox.critical(self, "Error", message)
+
+    def __update_progress(self) -> None:
+        """没有任务时隐藏进度条"""
+        if not self.__tasks:
+            self.progress_bar.hide()
+            self.cancel_button.hide()
+
+    def closeEvent(self, event) -> None:
+        self.__cancel()
+        super().closeEvent(event)
+
+    def __top_k_cb(self) -> None:
+        """修改显示行数时回调，只刷新表格"""
+        if not self.inited:
+            return
+        net1 = self.net_selector1.currentText()
+        net2 = self.net_selector2.currentText()
+        if net1 == "" or net2 == "" or net1 == net2:
+            return
+        self.clear_heatmap_table()
+        self.__refresh_heatmap_table(net1, net2)
+        if self.__picked is not None:
+            self.__refresh_net_table(*self.__picked)
+        if self.__blocks is not None:
+            self.__refresh_hierarchy(self.__blocks)
+
+    @property
+    def selected_metric(self) -> str:
+        """热力图显示的每个分块的统计量，两个网络的值相加"""
+        return self.metric_selector.currentText()
+
+    @property
+    def top_k(self) -> int:
+        """表格显示的行数，0 表示全部"""
+        return self.top_k_selector.value()
 
     def clear_all(self) -> None:
         """清空所有内容"""
         self.clear_heatmap()
         self.clear_heatmap_table()
+        self.clear_hierarchy()
         self.clear_net_table()
 
+    def clear_hierarchy(self) -> None:
+        self.__blocks = None
+        self.hierarchy_tree.clear()
+
+    def __refresh_hierarchy(self, blocks: Tuple[np.ndarray, np.ndarray]) -> None:
+        """`blocks` 为层次结构每个节点的压降和实例数，先只显示顶层节点"""
+        self.__blocks = blocks
+        self.hierarchy_tree.clear()
+        self.__add_blocks(self.hierarchy_tree.invisibleRootItem(), -1)
+
+    def __add_blocks(self, parent: QTreeWidgetItem, node: int) -> None:
+        """添加 `node` 的子节点，按压降从大到小，最多 Top K 个"""
+        hierarchy = self.collection.hierarchy
+        drop, count = self.__blocks
+        children = hierarchy.children(node)
+        children = children[count[children] > 0]
+        order = np.argsort(-drop[children], kind="stable")
+        if self.top_k:
+            order = order[: self.top_k]
+        for child in children[order].tolist():
+            item = QTreeWidgetItem(
+                [hierarchy.name(child), f"{drop[child]:.2f}", f"{count[child]}"]
+            )
+            item.setData(0, Qt.ItemDataRole.UserRole, child)
+            if len(hierarchy.children(child)):
+                item.setChildIndicatorPolicy(
+                    QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator
+                )
+            parent.addChild(item)
+
+    def __hierarchy_expand_cb(self, item: QTreeWidgetItem) -> None:
+        """展开时才添加子节点"""
+        if item.childCount() == 0 and self.__blocks is not None:
+            self.__add_blocks(item, item.data(0, Qt.ItemDataRole.UserRole))
+
+    def __hierarchy_click_cb(self, item: QTreeWidgetItem) -> None:
+        """显示该模块下压降最大的实例"""
+        net1 = self.net_selector1.currentText()
+        net2 = self.net_selector2.currentText()
+        path = self.collection.hierarchy.full_path(
+            item.data(0, Qt.ItemDataRole.UserRole)
+        )
+        k = self.top_k or self.collection.size
+        self.__fill_net_tables(
+            [self.collection.top_k(net, k, block=path) for net in (net1, net2)]
+        )
+
+    def clear_dashboard(self) -> None:
+        self.__dashboard_pairs = []
+        self.__dashboard_axes = []
+        self.dashboard_figure.clear()
+        self.dashboard_canvas.draw_idle()
+
+    def __invalidate_dashboard(self) -> None:
+        """分块或统计量变化后标记小多图过期，页面可见时立即重新计算"""
+        self.__dashboard_stale = True
+        if self.right_tabs.currentWidget() is self.dashboard_canvas:
+            self.__refresh_dashboard()
+
+    def __right_tabs_cb(self, index: int) -> None:
+        if (
+            self.__dashboard_stale
+            and self.right_tabs.widget(index) is self.dashboard_canvas
+        ):
+            self.__refresh_dashboard()
+
+    def __refresh_dashboard(self) -> None:
+        """后台计算所有电源域的压降
+
+        各网络对来自同一组分块，每个网络的分块统计只算一次并被缓存
+        """
+        if not self.inited:
+            return
+        self.__dashboard_stale = False
+        tiles, metric = self.tiles, self.selected_metric
+        pairs = domain_pairs(list(self.collection.keys()))
+
+        def work(report: Progress) -> tuple:
+            drops = [np.array(tiles.drop(net1, net2, metric)) for net1, net2 in pairs]
+            return pairs, drops, metric
+
+        self.__submit("dashboard", work, self.__draw_dashboard, "Computing dashboard")
+
+    @profiled("ui.draw_dashboard")
+    def __draw_dashboard(self, result: tuple) -> None:
+        """重建所有子图后只触发一次重绘"""
+        pairs, drops, metric = result
+        self.dashboard_figure.clear()
+        self.__dashboard_pairs = pairs
+        self.__dashboard_axes = []
+        if pairs:
+            self.__dashboard_axes = draw_dashboard(
+                self.dashboard_figure,
+                drops,
+                [f"{net1} - {net2}" for net1, net2 in pairs],
+                label=metric if self.baseline is None else f"Δ {metric}",
+                symmetric=self.baseline is not None,
+            )
+        else:
+            self.dashboard_figure.text(
+                0.5, 0.5, "No supply/ground pairs", ha="center", va="center"
+            )
+        current().items = len(pairs)
+        self.dashboard_canvas.draw_idle()
+
+    def __dashboard_press_cb(self, event: MouseEvent) -> None:
+        """点击子图时切换到该网络对的热力图"""
+        if event.inaxes not in self.__dashboard_axes:
+            return
+        pair = self.__dashboard_pairs[self.__dashboard_axes.index(event.inaxes)]
+        for sel, net in zip([self.net_selector1, self.net_selector2], pair):
+            sel.blockSignals(True)
+            sel.setCurrentText(net)
+            sel.blockSignals(False)
+        self.right_tabs.setCurrentWidget(self.heatmap_canvas)
+        self.__net_selector_cb()
+
     def clear_heatmap_table(self) -> None:
-        clear_table_items(self.heatmap_table)
+        self.heatmap_table.model().clear()
 
+    @profiled("ui.refresh_heatmap_table")
     def __refresh_heatmap_table(self, net1: str, net2: str) -> None:
-        for pos, collection in self.tiles.items():
-            value = collection.calc_drop(net1, net2)
-            add_strings_to_table(
-                self.heatmap_table, [f"{pos[0]}", f"{pos[1]}", f"{value:.2f}"]
-            )
-        self.heatmap_table.sortItems(2, order=Qt.SortOrder.DescendingOrder)
+        if self.top_k:
+            top = self.tiles.top_k_tiles(net1, net2, self.top_k, self.selected_metric)
+            cols = np.array([col for (col, _), _ in top], dtype=np.intp)
+            rows = np.array([row for (_, row), _ in top], dtype=np.intp)
+            values = np.array([value for _, value in top], dtype=float)
+        else:
+            drop = self.tiles.drop(net1, net2, self.selected_metric)
+            cols, rows = np.indices(drop.shape).reshape(2, -1)
+            values = drop.ravel()
+        self.heatmap_table.model().set_columns([cols, rows, values])
+        self.heatmap_table.sortByColumn(2, Qt.SortOrder.DescendingOrder)
+        current().items = len(values)
 
     def clear_net_table(self) -> None:
-        clear_table_items(self.net_table1)
-        clear_table_items(self.net_table2)
+        self.__picked = None
+        self.net_table1.model().clear()
+        self.net_table2.model().clear()
 
-    def __heatmap_table_click_cb(self, item: "AlphaNumCmpItem") -> None:
-        col, row = (
-            int(self.heatmap_table.item(item.row(), 0).text()),
-            int(self.heatmap_table.item(item.row(), 1).text()),
-        )
+    def __heatmap_table_click_cb(self, index: QModelIndex) -> None:
+        model = self.heatmap_table.model()
+        col, row = int(model.value(index.row(), 0)), int(model.value(index.row(), 1))
         self.__refresh_net_table(col, row)
         self.__update_heatmap_hilight(col, row)
 
+    @profiled("ui.refresh_net_table")
     def __refresh_net_table(self, col: int, row: int) -> None:
-        self.clear_net_table()
         net1 = self.net_selector1.currentText()
         net2 = self.net_selector2.currentText()
-        for net, table in zip([net1, net2], [self.net_table1, self.net_table2]):
-            for item in self.tiles[col, row][net]:
-                add_strings_to_table(
-                    table,
-                    [f"{item.x:.2f}", f"{item.y:.2f}", f"{item.value:.2f}", item.path],
-                )
-            table.sortItems(2, order=Qt.SortOrder.DescendingOrder)
+        tile = self.tiles[col, row]
+        if self.top_k:
+            items_list = [tile.top_k(net, self.top_k) for net in (net1, net2)]
+        else:
+            items_list = [tile[net1], tile[net2]]
+        self.__fill_net_tables(items_list)
+        self.__picked = (col, row)
+        current().items = sum(len(items) for items in items_list)
+
+    def __refresh_net_table_nearest(self, x: float, y: float) -> None:
+        """显示距离 (x, y) 最近的实例"""
+        net1 = self.net_selector1.currentText()
+        net2 = self.net_selector2.currentText()
+        self.__fill_net_tables(
+            [
+                self.collection.nearest_k(x, y, NEAREST_K, net=net)
+                for net in (net1, net2)
+            ]
+        )
+
+    def __fill_net_tables(self, items_list: Sequence[Items]) -> None:
+        self.clear_net_table()
+        for items, table in zip(items_list, [self.net_table1, self.net_table2]):
+            paths = items.collection.columns.path[items.index]
+            table.model().set_columns([items.x, items.y, items.values, paths])
+            table.sortByColumn(2, Qt.SortOrder.DescendingOrder)
+
+    def __path_text(self, code: int) -> str:
+        """路径编号转为文本，只在单元格可见或按路径排序时调用"""
+        path = self.collection.paths[code]
+        return "" if path is None else path
 
     def clear_heatmap(self) -> None:
-        self.heatmap_figure.clear()
-        self.heatmap_canvas.draw()
+        self.heatmap_axes.set_visible(False)
+        self.heatmap_colorbar.ax.set_visible(False)
+        self.__annotate()
+        self.heatmap_hilight_rect.set_visible(False)
+        self.__background = None
+        self.heatmap_canvas.draw_idle()
+
+    def __canvas_press_cb(self, event: MouseEvent) -> None:
+        """合并同一轮事件循环内的多次点击，只处理最后一次"""
+        self.__pressed = event
+        self.__press_timer.start()
+
+    def __press_timeout_cb(self) -> None:
+        if self.__pressed is not None:
+            event, self.__pressed = self.__pressed, None
+            self.__heatmap_canvas_cb(event)
+
+    def __canvas_motion_cb(self, event: MouseEvent) -> None:
+        """悬停事件节流，每个间隔最多处理一次"""
+        self.__hovered = event
+        if not self.__hover_timer.isActive():
+            self.__hover_timer.start()
+
+    def __hover_timeout_cb(self) -> None:
+        event, self.__hovered = self.__hovered, None
+        if event is None or event.inaxes != self.heatmap_axes:
+            self.statusBar().clearMessage()
+            return
+        col, row = int(event.xdata), int(event.ydata)
+        if not (
+            0 <= col < self.value_array.shape[0]
+            and 0 <= row < self.value_array.shape[1]
+        ):
+            return
+        x = self.tiles.origin[0] + event.xdata * self.tiles.size[0]
+        y = self.tiles.origin[1] + event.ydata * self.tiles.size[1]
+        self.statusBar().showMessage(
+            f"Col {col}, Row {row}: {self.value_array[col, row]:.2f}"
+            f"    X {x:.2f}, Y {y:.2f}"
+        )
+
+    def __canvas_draw_cb(self, event) -> None:
+        """完整重绘后缓存背景，再画上高亮框"""
+        self.__background = self.heatmap_canvas.copy_from_bbox(self.heatmap_figure.bbox)
+        self.heatmap_axes.draw_artist(self.heatmap_hilight_rect)
+
+    def __blit(self) -> None:
+        """恢复缓存的背景，只重绘高亮框"""
+        if self.__background is None:
+            self.heatmap_canvas.draw_idle()
+            return
+        self.heatmap_canvas.restore_region(self.__background)
+        self.heatmap_axes.draw_artist(self.heatmap_hilight_rect)
+        self.heatmap_canvas.blit(self.heatmap_figure.bbox)
 
     def __heatmap_canvas_cb(self, event: MouseEvent) -> None:
-        if event.inaxes == self.heatmap_axes:
-            col, row = int(event.xdata), int(event.ydata)
+        if event.inaxes != self.heatmap_axes:
+            return
+        col, row = int(event.xdata), int(event.ydata)
+        if event.button == MouseButton.RIGHT:
+            # 右键：按坐标查询最近的实例
+            x = self.tiles.origin[0] + event.xdata * self.tiles.size[0]
+            y = self.tiles.origin[1] + event.ydata * self.tiles.size[1]
+            self.__refresh_net_table_nearest(x, y)
+        else:
             self.__refresh_net_table(col, row)
-            self.__update_heatmap_hilight(col, row)
+        self.__update_heatmap_hilight(col, row)
 
-    def __refresh_heatmap(self, net1: str, net2: str) -> None:
+    def __init_heatmap(self) -> None:
+        """创建复用的图像、网格线和色条，刷新时只更新数据"""
         self.heatmap_axes = self.heatmap_figure.add_subplot(111)
-        info = self.tiles.array_info(net1, net2)
-        self.__value_array = info.ndarray
-        seaborn.heatmap(
-            self.value_array,
-            # annot=True,
-            # fmt=".2f",
+        self.heatmap_image = self.heatmap_axes.imshow(
+            np.zeros((1, 1)),
             cmap="coolwarm",
-            ax=self.heatmap_axes,
-            linewidths=0.5,
-            linecolor="#000000",
+            origin="lower",
+            extent=(0, 1, 0, 1),
+            aspect="auto",
+            interpolation="nearest",
+        )
+        self.heatmap_colorbar = self.heatmap_figure.colorbar(
+            self.heatmap_image, ax=self.heatmap_axes
         )
-        cell_drop = self.collection.calc_drop(net1, net2)
-        self.heatmap_axes.set_title(f"{net1} - {net2} - {cell_drop:.2f}")
+        self.heatmap_grid = LineCollection([], colors="#000000", linewidths=0.5)
+        self.heatmap_axes.add_collection(self.heatmap_grid, autolim=False)
         self.heatmap_axes.set_xlabel("Columns")
         self.heatmap_axes.set_ylabel("Rows")
-        self.heatmap_axes.invert_yaxis()
-
-        # append text
-        mid_value = (info.max + info.min) / 2
-        qtr_value = (info.max - info.min) / 4
-        for col in range(self.array[0]):
-            for row in range(self.array[1]):
-                value = self.value_array[row, col]
-                if abs(value - mid_value) > qtr_value:
-                    color = "#FFFFFF"
-                else:
-                    color = "#000000"
-                self.heatmap_axes.text(
-                    col + 0.5,
-                    row + 0.5,
-                    f"{value:.2f}",
-                    ha="center",
-                    va="center",
-                    color=color,
-                    fontsize=10,
-                )
-
-        self.heatmap_canvas.draw()
-        self.heatmap_canvas.mpl_connect("button_press_event", self.__heatmap_canvas_cb)
-
-    def __update_heatmap_hilight(self, col: int, row: int) -> None:
-        if hasattr(self, "heatmap_hilight_rect"):
-            self.heatmap_hilight_rect.remove()
+        formatter = FuncFormatter(lambda value, _: f"{int(value)}")
+        self.heatmap_axes.xaxis.set_major_formatter(formatter)
+        self.heatmap_axes.yaxis.set_major_formatter(formatter)
+        self.heatmap_axes.callbacks.connect("xlim_changed", self.__annotate)
+        self.heatmap_axes.callbacks.connect("ylim_changed", self.__annotate)
+        self.__annotations = []
+        # 高亮框不参与完整重绘，单独 blit
         self.heatmap_hilight_rect = Rectangle(
-            xy=(col, row),
+            xy=(0, 0),
             width=1,
             height=1,
             linewidth=3,
             edgecolor="#F5D83E",
             facecolor="none",
+            animated=True,
+            visible=False,
         )
         self.heatmap_axes.add_patch(self.heatmap_hilight_rect)
-        self.heatmap_canvas.draw()
+        self.__background = None
+        self.heatmap_axes.set_visible(False)
+        self.heatmap_colorbar.ax.set_visible(False)
+
+    @profiled("ui.refresh_heatmap")
+    def __refresh_heatmap(
+        self,
+        net1: str,
+        net2: str,
+        info: ArrayInfo,
+        cell_drop: float,
+        metric: str = "max",
+    ) -> None:
+        self.__value_array = info.ndarray
+        cols, rows = self.value_array.shape
+        current().items = cols * rows
+        axes = self.heatmap_axes
+        # 转置后横轴为 col（x 方向），纵轴为 row（y 方向）
+        self.heatmap_image.set_data(self.value_array.T)
+        self.heatmap_image.set_extent((0, cols, 0, rows))
+        if self.baseline is None:
+            self.heatmap_image.set_clim(info.min, info.max)
+        else:
+            # 变化量以 0 为中心着色
+            bound = max(abs(info.min), abs(info.max))
+            self.heatmap_image.set_clim(-bound, bound)
+        axes.set_xlim(0, cols, emit=False)
+        axes.set_ylim(0, rows, emit=False)
+        # 刻度在单元格中心，格子多时抽稀
+        axes.xaxis.set_major_locator(IndexLocator(max(cols // 20, 1), 0.5))
+        axes.yaxis.set_major_locator(IndexLocator(max(rows // 20, 1), 0.5))
+        if max(cols, rows) <= GRID_LINES:
+            self.heatmap_grid.set_segments(
+                [[(col, 0), (col, rows)] for col in range(cols + 1)]
+                + [[(0, row), (cols, row)] for row in range(rows + 1)]
+            )
+        else:
+            self.heatmap_grid.set_segments([])
+        if self.baseline is None:
+            axes.set_title(f"{net1} - {net2} - max {cell_drop:.2f}")
+        else:
+            axes.set_title(f"{net1} - {net2} - max Δ {cell_drop:+.2f}")
+        self.heatmap_colorbar.set_label(metric)
+        axes.set_visible(True)
+        self.heatmap_colorbar.ax.set_visible(True)
+        self.__annotate()
+        self.__background = None
+        self.heatmap_canvas.draw_idle()
+
+    def __annotate(self, *_) -> None:
+        """为可见的单元格标注数值，可见单元格过多时不标注"""
+        for text in self.__annotations:
+            text.remove()
+        self.__annotations = []
+        if not self.heatmap_axes.get_visible():
+            return
+        cols, rows = self.value_array.shape
+        x0, x1 = sorted(self.heatmap_axes.get_xlim())
+        y0, y1 = sorted(self.heatmap_axes.get_ylim())
+        col0, col1 = max(int(x0), 0), min(int(np.ceil(x1)), cols)
+        row0, row1 = max(int(y0), 0), min(int(np.ceil(y1)), rows)
+        self.__annotations = annotate(
+            self.heatmap_axes,
+            self.heatmap_image,
+            self.value_array,
+            range(col0, col1),
+            range(row0, row1),
+        )
+
+    def __update_heatmap_hilight(self, col: int, row: int) -> None:
+        self.heatmap_hilight_rect.set_xy((col, row))
+        self.heatmap_hilight_rect.set_visible(True)
+        self.__blit()
 
     def __ui(self) -> None:
         self.setWindowTitle(f"IR-Drop Heatmap - {release.version}")
@@ -234,70 +857,205 @@ class HeatmapWindow(QMainWindow):
         # 左侧
         left_region = QWidget()
         left_region.setLayout(left_layout := QVBoxLayout())
+        # 左侧分辨率选择
+        array_region = QWidget()
+        array_region.setLayout(array_layout := QHBoxLayout())
+        array_layout.addWidget(QLabel("Array:"))
+        array_layout.addWidget(array_selector := QComboBox())
+        array_selector.currentIndexChanged.connect(self.__array_selector_cb)
+        self.array_selector = array_selector
+        left_layout.addWidget(array_region)
+        # 左侧统计量选择
+        metric_region = QWidget()
+        metric_region.setLayout(metric_layout := QHBoxLayout())
+        metric_layout.addWidget(QLabel("Metric:"))
+        metric_layout.addWidget(metric_selector := QComboBox())
+        metric_selector.addItems(METRICS)
+        metric_selector.currentIndexChanged.connect(self.__metric_selector_cb)
+        self.metric_selector = metric_selector
+        left_layout.addWidget(metric_region)
+        # 左侧显示行数选择
+        top_k_region = QWidget()
+        top_k_region.setLayout(top_k_layout := QHBoxLayout())
+        top_k_layout.addWidget(QLabel("Top K:"))
+        top_k_layout.addWidget(top_k_selector := QSpinBox())
+        top_k_selector.setRange(0, 1_000_000)
+        top_k_selector.setSingleStep(100)
+        top_k_selector.setSpecialValueText("All")
+        top_k_selector.setValue(TOP_K)
+        top_k_selector.valueChanged.connect(self.__top_k_cb)
+        self.top_k_selector = top_k_selector
+        left_layout.addWidget(top_k_region)
         # 左侧 heatmap 信息表格
-        self.heatmap_table = QTableWidget()
-        self.heatmap_table.setColumnCount(3)
-        self.heatmap_table.setHorizontalHeaderLabels(["Col", "Row", "Value"])
-        self.heatmap_table.horizontalHeader().setSectionResizeMode(
-            QHeaderView.ResizeMode.Stretch
+        self.heatmap_table = create_table(
+            ArrayTableModel(["Col", "Row", "Value"], ["{}", "{}", "{:.2f}"])
         )
-        self.heatmap_table.setSortingEnabled(True)
         self.heatmap_table.clicked.connect(self.__heatmap_table_click_cb)
-        left_layout.addWidget(self.heatmap_table)
+        # 左侧层次结构浏览，与分块表格分页显示
+        self.hierarchy_tree = QTreeWidget()
+        self.hierarchy_tree.setHeaderLabels(["Block", "Drop", "Count"])
+        self.hierarchy_tree.itemExpanded.connect(self.__hierarchy_expand_cb)
+        self.hierarchy_tree.itemClicked.connect(self.__hierarchy_click_cb)
+        self.left_tabs = QTabWidget()
+        self.left_tabs.addTab(self.heatmap_table, "Tiles")
+        self.left_tabs.addTab(self.hierarchy_tree, "Hierarchy")
+        left_layout.addWidget(self.left_tabs)
 
         # 右侧
         right_region = QSplitter(Qt.Orientation.Vertical)  # 右侧垂直分割窗
         # 右侧 heatmap
         self.heatmap_figure = Figure(facecolor="#DFDFDF")
         self.heatmap_canvas = FigureCanvasQTAgg(self.heatmap_figure)
-        right_region.addWidget(self.heatmap_canvas)
+        # 完整重绘计入 profile，关闭时只多一次判断
+        self.heatmap_canvas.draw = profiled("ui.draw_heatmap")(self.heatmap_canvas.draw)
+        # 右侧小多图，所有电源域并排显示，共用同一色阶
+        self.dashboard_figure = Figure(facecolor="#DFDFDF")
+        self.dashboard_canvas = FigureCanvasQTAgg(self.dashboard_figure)
+        self.dashboard_canvas.mpl_connect(
+            "button_press_event", self.__dashboard_press_cb
+        )
+        self.right_tabs = QTabWidget()
+        self.right_tabs.addTab(self.heatmap_canvas, "Heatmap")
+        self.right_tabs.addTab(self.dashboard_canvas, "Dashboard")
+        self.right_tabs.currentChanged.connect(self.__right_tabs_cb)
+        right_region.addWidget(self.right_tabs)
         self.heatmap_canvas.setSizePolicy(
             QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding
         )
+        self.__init_heatmap()
+        # 画布事件只连接一次
+        self.__pressed: Optional[MouseEvent] = None
+        self.__press_timer = QTimer(self)
+        self.__press_timer.setSingleShot(True)
+        self.__press_timer.setInterval(0)
+        self.__press_timer.timeout.connect(self.__press_timeout_cb)
+        self.__hovered: Optional[MouseEvent] = None
+        self.__hover_timer = QTimer(self)
+        self.__hover_timer.setSingleShot(True)
+        self.__hover_timer.setInterval(HOVER_INTERVAL)
+        self.__hover_timer.timeout.connect(self.__hover_timeout_cb)
+        self.heatmap_canvas.mpl_connect("button_press_event", self.__canvas_press_cb)
+        self.heatmap_canvas.mpl_connect("motion_notify_event", self.__canvas_motion_cb)
+        self.heatmap_canvas.mpl_connect("draw_event", self.__canvas_draw_cb)
         # 右侧底部表格分区
         bottom_region = QSplitter(Qt.Orientation.Horizontal)  # 右侧底部水平分割窗
         right_region.addWidget(bottom_region)
         self.net_selector1, self.net_table1 = create_selector(
             parent=bottom_region,
             callback=self.__net_selector_cb,
+            paths=self.__path_text,
         )
         self.net_selector2, self.net_table2 = create_selector(
             parent=bottom_region,
             callback=self.__net_selector_cb,
+            paths=self.__path_text,
         )
 
         main_splitter.addWidget(left_region)
         main_splitter.addWidget(right_region)
 
+        # 状态栏后台任务进度
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(lambda: self.__cancel())
+        self.cancel_button.hide()
+        self.statusBar().addPermanentWidget(self.cancel_button)
+        self.__watch_timer = QTimer(self)
+        self.__watch_timer.setInterval(WATCH_INTERVAL)
+        self.__watch_timer.timeout.connect(self.__watch_timeout_cb)
 
-class AlphaNumCmpItem(QTableWidgetItem):
-    def __lt__(self, other: "AlphaNumCmpItem") -> bool:
-        try:
-            return float(self.text()) < float(other.text())
-        except ValueError:
-            return self.text() < other.text()
-
-
-def add_strings_to_table(table: QTableWidget, strings: Sequence[str]) -> None:
-    """向表格中添加一行，items 代表这一行的每一列内容"""
-    table.setSortingEnabled(False)
-    row_num = table.rowCount()
-    table.insertRow(row_num)
-    for i, s in enumerate(strings):
-        table.setItem(row_num, i, AlphaNumCmpItem(s))
-    table.setSortingEnabled(True)
 
+class ArrayTableModel(QAbstractTableModel):
+    """直接引用 numpy 列数组的只读表格模型
+
+    视图只向模型请求可见的单元格，所以只有可见行会被格式化。`formats` 中的
+    字符串是格式模板，按数值排序；函数把值转为文本，按文本排序。
+    """
+
+    def __init__(
+        self,
+        headers: Sequence[str],
+        formats: Sequence[Union[str, Callable[[Any], str]]],
+        parent: Optional[QWidget] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.formats = list(formats)
+        self.clear()
 
-def clear_table_items(table: QTableWidget) -> None:
-    """清空表格内容"""
-    for _ in range(table.rowCount()):
-        table.removeRow(0)
+    def clear(self) -> None:
+        self.set_columns([np.zeros(0) for _ in self.headers])
+
+    def set_columns(self, columns: Sequence[np.ndarray]) -> None:
+        """替换全部数据，保持原来的行顺序直到重新排序"""
+        self.beginResetModel()
+        self.__columns = [np.asarray(column) for column in columns]
+        self.__order = np.arange(len(self.__columns[0]))
+        self.endResetModel()
+
+    def value(self, row: int, column: int) -> Any:
+        """视图中第 row 行的原始值"""
+        return self.__columns[column][self.__order[row]]
+
+    def rowCount(self, parent: Optional[QModelIndex] = None) -> int:
+        return 0 if parent is not None and parent.isValid() else len(self.__order)
+
+    def columnCount(self, parent: Optional[QModelIndex] = None) -> int:
+        return 0 if parent is not None and parent.isValid() else len(self.headers)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        return self.__text(index.column(), self.value(index.row(), index.column()))
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+    def sort(
+        self,
+        column: int,
+        order: Qt.SortOrder = Qt.SortOrder.AscendingOrder,
+    ) -> None:
+        values = self.__columns[column]
+        if callable(self.formats[column]):
+            values = np.array([self.__text(column, v) for v in values.tolist()])
+        self.layoutAboutToBeChanged.emit()
+        self.__order = np.argsort(values, kind="stable")
+        if order == Qt.SortOrder.DescendingOrder:
+            self.__order = self.__order[::-1]
+        self.layoutChanged.emit()
+
+    def __text(self, column: int, value: Any) -> str:
+        fmt = self.formats[column]
+        return fmt(value) if callable(fmt) else fmt.format(value)
+
+
+def create_table(model: ArrayTableModel) -> QTableView:
+    table = QTableView()
+    table.setModel(model)
+    model.setParent(table)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+    table.setSortingEnabled(True)
+    return table
 
 
 def create_selector(
     parent: QSplitter,
     callback: Callable,
-) -> Tuple[QComboBox, QTableWidget]:
+    paths: Callable[[int], str],
+) -> Tuple[QComboBox, QTableView]:
     region = QWidget()
     parent.addWidget(region)
     region.setLayout(layout := QVBoxLayout())
@@ -309,9 +1067,10 @@ def create_selector(
     selector.currentIndexChanged.connect(callback)
     layout.addWidget(selector_region)
 
-    table = QTableWidget()
-    table.setColumnCount(4)
-    table.setHorizontalHeaderLabels(["X", "Y", "Value", "Path"])
-    table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+    table = create_table(
+        ArrayTableModel(
+            ["X", "Y", "Value", "Path"], ["{:.2f}", "{:.2f}", "{:.2f}", paths]
+        )
+    )
     layout.addWidget(table)
     return selector, table
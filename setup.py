@@ -17,7 +17,6 @@ URL = irhm.__url__
 install_requires = [
     "numpy",
     "matplotlib",
-    "seaborn ",
 ]
 
 if find_spec("PySide6") is None:
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+NETS = ("VCC", "VSS", "VCCA", "VSSA")
+
+
+@pytest.fixture
+def make_list(tmp_path):
+    """Factory writing a random ir.list of `count` items into `tmp_path`."""
+
+    def make(count: int = 2000, seed: int = 0, name: str = "ir.list"):
+        rng = np.random.default_rng(seed)
+        nets = rng.integers(0, len(NETS), count)
+        values = rng.gamma(2.0, 10.0, count)
+        xs, ys = rng.uniform(0, 100, (2, count))
+        depths = rng.integers(1, 5, count)
+        lines = ["#net  value  x      y      path"]
+        for net, value, x, y, depth in zip(nets, values, xs, ys, depths):
+            path = "/".join(f"X{s}" for s in rng.integers(0, 8, depth))
+            lines.append(f"{NETS[net]}  {value:.2f}  {x:.2f}  {y:.2f}  {path}")
+        file = tmp_path / name
+        file.write_text("\n".join(lines) + "\n")
+        return file
+
+    return make
@@ -0,0 +1,50 @@
+import numpy as np
+
+from irhm import _cache
+from irhm.ir import from_file
+
+
+def items(collection):
+    return {net: list(collection[net]) for net in collection.nets}
+
+
+def test_round_trip_matches_parse(make_list):
+    file = make_list()
+    parsed = from_file(file, cache=False)
+    assert not _cache.sidecar(file).exists()
+    written = from_file(file)
+    _, arrays = _cache.load(file)
+    assert "path" not in arrays
+    assert arrays["net"].size == parsed.size
+    loaded = from_file(file)
+    assert loaded.nets == parsed.nets
+    for name in ("net", "value", "x", "y", "path"):
+        expected = getattr(parsed.columns, name)
+        np.testing.assert_array_equal(getattr(written.columns, name), expected)
+        np.testing.assert_array_equal(getattr(loaded.columns, name), expected)
+    assert items(loaded) == items(parsed)
+
+
+def test_changed_file_invalidates(make_list):
+    file = make_list(count=500)
+    before = from_file(file)
+    with open(file, "a") as f:
+        f.write("VCC  999.00  1.00  2.00  X1/X2\n")
+    assert _cache.load(file) is None
+    after = from_file(file)
+    assert after.size == before.size + 1
+    assert after["VCC"].get_max() == 999.0
+    assert _cache.load(file) is not None
+
+
+def test_rebuild_cache_ignores_sidecar(make_list):
+    file = make_list(count=500)
+    parsed = from_file(file)
+    meta, arrays = _cache.load(file)
+    # a sidecar under the current key is trusted, even if it disagrees
+    arrays = dict(arrays, value=np.zeros_like(arrays["value"]))
+    assert _cache.save(file, meta, arrays, _cache.fingerprint(file))
+    assert not from_file(file).columns.value.any()
+    rebuilt = from_file(file, rebuild_cache=True)
+    np.testing.assert_array_equal(rebuilt.columns.value, parsed.columns.value)
+    np.testing.assert_array_equal(from_file(file).columns.value, parsed.columns.value)
@@ -0,0 +1,128 @@
+import numpy as np
+
+from irhm import ir
+from irhm.ir import Colleciton, Item, from_file, merge_blocks, read_appended
+
+ITEMS = [
+    Item("VCC", 1.5, 0.0, 1.0, "X1/X2"),
+    Item("VSS", 2.5, 3.0, 4.0),
+    Item("VCC", 0.5, 2.0, 2.0, "X3"),
+]
+
+
+def test_append_packs_items_into_columns():
+    collection = Colleciton()
+    for item in ITEMS:
+        collection.append(item)
+    columns = collection.columns
+    assert collection.nets == ["VCC", "VSS"]
+    assert columns.net.tolist() == [0, 1, 0]
+    assert columns.value.tolist() == [1.5, 2.5, 0.5]
+    assert columns.path.tolist() == [0, -1, 1]
+    assert [collection.paths[path] for path in columns.path] == ["X1/X2", None, "X3"]
+    assert list(collection["VCC"]) == [ITEMS[0], ITEMS[2]]
+    assert collection["VSS"].get_max() == 2.5
+
+
+def test_take_keeps_nets_and_paths():
+    collection = Colleciton()
+    for item in ITEMS:
+        collection.append(item)
+    subset = collection.take(np.array([2, 0]))
+    assert subset.nets == collection.nets
+    assert subset.columns.value.tolist() == [0.5, 1.5]
+    assert list(subset["VCC"]) == [ITEMS[2], ITEMS[0]]
+    assert "VSS" not in subset
+
+
+def test_update_bins_appended_items(make_list):
+    file = make_list(count=3000)
+    lines = file.read_bytes().splitlines(keepends=True)
+    lines.append(b"VDD  5.00  50.00  50.00  X1\n")
+    file.write_bytes(b"".join(lines[:1000]))
+    box = ((0.0, 0.0), (100.0, 100.0))
+    collection = from_file(file, cache=False)
+    tiles = collection.make_tiles(8, 8, box=box)
+    coarse = tiles.pool()
+    offset = file.stat().st_size
+    with open(file, "ab") as f:
+        f.writelines(lines[1000:])
+
+    blocks, snapshot = read_appended(file, offset)
+    assert snapshot.offset == file.stat().st_size
+    assert tiles.update(merge_blocks(collection, blocks))
+    coarse.repool()
+    expected = from_file(file, cache=False).make_tiles(8, 8, box=box)
+    assert collection.nets[-1] == "VDD"
+    np.testing.assert_array_equal(tiles.counts, expected.counts)
+    np.testing.assert_array_equal(tiles.maxima, expected.maxima)
+    np.testing.assert_array_equal(tiles.source, expected.source)
+    np.testing.assert_array_equal(coarse.maxima, expected.pool().maxima)
+    assert list(tiles[3, 4]) == list(expected[3, 4])
+
+
+def test_update_rejects_items_outside_grid():
+    collection = Colleciton()
+    for item in ITEMS:
+        collection.append(item)
+    tiles = collection.make_tiles(2, 2)
+    counts = tiles.counts.copy()
+    collection.append(Item("VCC", 9.0, 50.0, 1.0))
+    assert not tiles.update(np.array([collection.size - 1]))
+    np.testing.assert_array_equal(tiles.counts, counts)
+
+
+def test_out_of_core_matches_in_memory(make_list, tmp_path, monkeypatch):
+    monkeypatch.setattr(ir, "STREAM_ROWS", 256)
+    file = make_list(count=3000)
+    spill = tmp_path / "spill"
+    spill.mkdir()
+    memory = from_file(file, cache=False)
+    streamed = from_file(file, chunk_size=4096, out_of_core=True, spill_dir=spill)
+    assert streamed.out_of_core
+    assert streamed.nets == memory.nets
+    assert streamed.get_box() == memory.get_box()
+    for expected, tiles in zip(
+        memory.make_pyramid(8, 6, finer=1), streamed.make_pyramid(8, 6, finer=1)
+    ):
+        np.testing.assert_array_equal(tiles.counts, expected.counts)
+        np.testing.assert_array_equal(tiles.maxima, expected.maxima)
+        np.testing.assert_array_equal(
+            tiles.drop("VCC", "VSS"), expected.drop("VCC", "VSS")
+        )
+        assert tiles.top_k_tiles("VCC", "VSS", 5) == expected.top_k_tiles(
+            "VCC", "VSS", 5
+        )
+    assert list(streamed.top_k("VSSA", 10)) == list(memory.top_k("VSSA", 10))
+    region = (20.0, 30.0, 60.0, 70.0)
+    assert list(streamed.top_k("VCC", 10, region=region)) == list(
+        memory.top_k("VCC", 10, region=region)
+    )
+
+
+def tile_percentiles(tiles, net, q):
+    expected = np.zeros(tiles.shape)
+    for key in tiles:
+        values = tiles[key][net].values if net in tiles[key] else []
+        if len(values):
+            expected[key] = np.percentile(values, q)
+    return expected
+
+
+def test_percentiles_are_exact_for_small_nets(make_list):
+    tiles = from_file(make_list(), cache=False).make_tiles(5, 4)
+    for q in (95, 99):
+        np.testing.assert_allclose(
+            tiles.metric_array("VSS", f"p{q}"), tile_percentiles(tiles, "VSS", q)
+        )
+
+
+def test_percentiles_are_sketched_for_big_nets(make_list, monkeypatch):
+    monkeypatch.setattr(ir, "EXACT_ITEMS", 0)
+    collection = from_file(make_list(count=40000), cache=False)
+    tiles = collection.make_tiles(2, 2)
+    low, high = collection.value_range("VCC")
+    width = (high - low) / ir.SKETCH_BINS
+    for q in (95, 99):
+        error = tiles.metric_array("VCC", f"p{q}") - tile_percentiles(tiles, "VCC", q)
+        assert np.abs(error).max() <= width
@@ -0,0 +1,30 @@
+import numpy as np
+
+from irhm import _reader
+from irhm.ir import from_file
+
+
+def test_split_covers_file_at_line_starts(make_list):
+    file = make_list()
+    data = file.read_bytes()
+    ranges = _reader.split(file, 7)
+    assert len(ranges) == 7
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == len(data)
+    for i in range(1, len(ranges)):
+        start = ranges[i][0]
+        assert ranges[i - 1][1] == start
+        assert data[start - 1 : start] == b"\n"
+
+
+def test_parallel_parse_matches_serial(make_list):
+    file = make_list(count=5000)
+    serial = from_file(file, chunk_size=4096, cache=False)
+    parallel = from_file(file, chunk_size=4096, cache=False, workers=2)
+    assert parallel.nets == serial.nets
+    for name in ("net", "value", "x", "y"):
+        np.testing.assert_array_equal(
+            getattr(parallel.columns, name), getattr(serial.columns, name)
+        )
+    paths = [serial.paths[path] for path in serial.columns.path]
+    assert [parallel.paths[path] for path in parallel.columns.path] == paths
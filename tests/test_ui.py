@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from irhm.ir import Colleciton, Item
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("matplotlib")
+ui = pytest.importorskip("irhm.ui")
+
+
+def test_show_window():
+    """Showing the window paints it, which calls Qt virtuals such as
+    `QPaintDevice.metric` that the window must not shadow."""
+    collection = Colleciton()
+    collection.append(Item("VCC", 1.0, 0.0, 0.0, "X1/X2"))
+    collection.append(Item("VSS", 2.0, 5.0, 5.0, "X1/X3"))
+    app = ui.HeatmapApp([], collection=collection, array=(2, 2))
+    app.show()
+    window = app.window
+    for _ in range(5):
+        window.pool.waitForDone()
+        app.processEvents()
+    window.repaint()
+    assert window.isVisible()
+    assert window.inited
+    window.close()